@@ -0,0 +1,232 @@
+"""Deterministic benchmarks for the simulation tick.
+
+Each scenario builds a seeded galaxy and a seeded probe population, runs
+some warm-up ticks, then times every phase of the tick separately:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --output new.json --compare bench.json --threshold 0.15
+
+Compare mode exits with status 1 if any phase got slower than the
+baseline by more than the threshold.
+"""
+import argparse
+import functools
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+from events import EVENTS, OFF
+from simulation import WORLD_WIDTH, NUM_STARS, Probe, Simulation
+
+DEFAULT_PROBES = (1, 100, 1000, 10000)
+DEFAULT_STARS = (2000, 20000, 200000)
+RENDER_ZOOMS = (1.0, 0.5, 0.2)  # The last is below render.LOD_ZOOM, so it times the probe density layer
+
+
+# --------------------------
+# Scenario Setup
+# --------------------------
+def world_size_for(num_stars):
+    """Scales the default world so larger galaxies keep the default star density."""
+    return int(WORLD_WIDTH * math.sqrt(num_stars / NUM_STARS))
+
+
+def build_scenario(num_probes, num_stars, seed, vectorised=False):
+    """Seeded galaxy plus `num_probes` probes scattered uniformly across it."""
+    random.seed(seed)  # Anything still drawing from the module RNG
+    size = world_size_for(num_stars)
+    simulation = Simulation(size, size, num_stars, vectorised=vectorised, seed=seed)
+    rng = random.Random(seed + 1)
+    probes = [Probe(rng.uniform(0, size), rng.uniform(0, size), simulation.stars, simulation.colony)
+              for _ in range(num_probes)]
+    simulation.probes[:] = probes
+    return simulation
+
+
+# --------------------------
+# Timing
+# --------------------------
+def _renderer():
+    """Returns a function giving a simulation's render phases as (name, callable) pairs, or None without pygame.
+
+    The phases are the viewer's: publishing a snapshot, then one frame
+    per RENDER_ZOOMS level drawn from it with the viewer's own layers and
+    draw calls, centred on the colony on an off-screen display.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    try:
+        import pygame
+    except ImportError:
+        return None
+    from render import WIDTH, HEIGHT, ProbeDensityLayer, StarLayer, draw_colony, draw_probes
+    from sim_thread import Snapshot
+
+    pygame.display.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+
+    def render_phases(simulation):
+        star_layer = StarLayer(simulation.stars)
+        simulation.colony.star_index.listeners.append(star_layer.mark_dirty)
+        density_layer = ProbeDensityLayer()
+        colony = simulation.colony
+        snapshots = [None, None]  # Previous and latest, as the viewer holds them
+
+        def publish():
+            latest = Snapshot(simulation, time.perf_counter())
+            snapshots[:] = [snapshots[1] or latest, latest]
+
+        def frame(zoom_level):
+            previous, latest = snapshots
+            offset_x = colony.x - WIDTH / (2 * zoom_level)
+            offset_y = colony.y - HEIGHT / (2 * zoom_level)
+            star_layer.draw(screen, offset_x, offset_y, zoom_level)
+            xs, ys = latest.positions(previous, latest.time)
+            draw_probes(screen, density_layer, xs, ys, latest.target_x, latest.target_y, latest.has_target,
+                        offset_x, offset_y, zoom_level)
+            draw_colony(colony, screen, offset_x, offset_y, zoom_level)
+
+        phases = [("snapshot", publish)]
+        for zoom_level in RENDER_ZOOMS:
+            phases.append((f"render_{zoom_level:g}x", functools.partial(frame, zoom_level)))
+        return phases
+
+    return render_phases
+
+
+def time_scenario(simulation, ticks, warmup, render=None):
+    """Runs warm-up ticks, then returns {phase: [seconds per tick]} over `ticks` timed ticks."""
+    phases = [
+        ("probes", simulation.update_probes),
+        ("colony", simulation.update_colony),
+        ("grid", simulation.rebuild_grid),
+        ("communicate", simulation.communicate),
+    ]
+    if render is not None:
+        phases.extend(render(simulation))
+
+    samples = {name: [] for name, _ in phases}
+    clock = time.perf_counter
+    for tick in range(warmup + ticks):
+        for name, phase in phases:
+            start = clock()
+            phase()
+            if tick >= warmup:
+                samples[name].append(clock() - start)
+        simulation.tick += 1
+    return samples
+
+
+def summarise(times):
+    return {
+        "median_ms": statistics.median(times) * 1000,
+        "mean_ms": statistics.fmean(times) * 1000,
+        "min_ms": min(times) * 1000,
+        "max_ms": max(times) * 1000,
+    }
+
+
+def run_benchmarks(probe_counts, star_counts, ticks, warmup, seed, render=True, vectorised=False, log=None):
+    renderer = _renderer() if render else None
+    results = []
+    for num_stars in star_counts:
+        for num_probes in probe_counts:
+            start = time.perf_counter()
+            simulation = build_scenario(num_probes, num_stars, seed, vectorised)
+            setup_seconds = time.perf_counter() - start
+            samples = time_scenario(simulation, ticks, warmup, renderer)
+            result = {
+                "scenario": f"p{num_probes}_s{num_stars}",
+                "probes": num_probes,
+                "stars": num_stars,
+                "ticks": ticks,
+                "setup_ms": setup_seconds * 1000,
+                "phases": {name: summarise(times) for name, times in samples.items()},
+            }
+            result["tick_median_ms"] = sum(phase["median_ms"] for phase in result["phases"].values())
+            results.append(result)
+            if log is not None:
+                log(result)
+    return results
+
+
+# --------------------------
+# Comparison
+# --------------------------
+def compare(results, baseline, threshold):
+    """Returns (scenario, phase, baseline_ms, current_ms, ratio) for every phase slower than the threshold."""
+    baseline_by_scenario = {result["scenario"]: result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline_by_scenario.get(result["scenario"])
+        if previous is None:
+            continue
+        for phase, summary in result["phases"].items():
+            if phase not in previous["phases"]:
+                continue
+            before = previous["phases"][phase]["median_ms"]
+            after = summary["median_ms"]
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append((result["scenario"], phase, before, after, after / before))
+    return regressions
+
+
+def _int_list(text):
+    return [int(value) for value in text.split(",") if value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation tick phase by phase.")
+    parser.add_argument("--probes", type=_int_list, default=list(DEFAULT_PROBES), help="Comma-separated probe counts")
+    parser.add_argument("--stars", type=_int_list, default=list(DEFAULT_STARS), help="Comma-separated star counts")
+    parser.add_argument("--ticks", type=int, default=50, help="Timed ticks per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed ticks before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--vectorised", action="store_true", help="Move probes with the NumPy engine")
+    parser.add_argument("--no-render", action="store_true", help="Skip the snapshot and render phases")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the results")
+    parser.add_argument("--compare", default=None, help="Baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before flagging, e.g. 0.1")
+    args = parser.parse_args()
+
+    EVENTS.level = OFF  # Keep event bookkeeping out of the measurements
+
+    def log(result):
+        print(f"{result['scenario']:>16}: {result['tick_median_ms']:9.3f} ms/tick  " + "  ".join(
+            f"{name}={summary['median_ms']:.3f}" for name, summary in result["phases"].items()))
+
+    results = run_benchmarks(args.probes, args.stars, args.ticks, args.warmup, args.seed,
+                             render=not args.no_render, vectorised=args.vectorised, log=log)
+    report = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "ticks": args.ticks,
+            "warmup": args.warmup,
+            "vectorised": args.vectorised,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        for scenario, phase, before, after, ratio in regressions:
+            print(f"REGRESSION {scenario} {phase}: {before:.3f} ms -> {after:.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No phase slower than {args.threshold:.0%} over the baseline")
+
+
+if __name__ == "__main__":
+    main()
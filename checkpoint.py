@@ -0,0 +1,306 @@
+"""Compact binary checkpoints of a running simulation.
+
+A checkpoint file is a small JSON header followed by raw, 64-byte aligned
+NumPy arrays, so loading maps the arrays straight from disk instead of
+parsing them. Object references (probe targets, the colony, the star list)
+are stored as integer IDs and rebuilt on load.
+"""
+import hashlib
+import json
+import os
+import random
+import struct
+import threading
+
+import numpy as np
+
+from events import EVENTS
+from simulation import MAX_CARGO, Colony, ExplorationTarget, Probe, SimConfig, Simulation, Star
+from star_index import RESOURCE_TYPES
+
+MAGIC = b"PROBESA1"
+ALIGNMENT = 64
+
+TARGET_NONE = 0
+TARGET_STAR = 1
+TARGET_COLONY = 2
+TARGET_EXPLORATION = 3
+NO_CLAIM = (0,) * len(RESOURCE_TYPES)  # A claim is always on the probe's target star, so only rates are stored
+
+COLONY_FIELDS = (
+    "x", "y", "minerals", "gases", "energy", "research", "probe_construction_timer",
+    "probe_speed_researched", "research_labs", "lab_construction_timer", "delivered",
+)
+
+
+# --------------------------
+# Array File Format
+# --------------------------
+def write_arrays(path, arrays, meta):
+    """Writes named arrays plus a JSON-serialisable meta dict; the file is swapped in atomically."""
+    entries = {}
+    offset = 0
+    prepared = []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        entries[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        prepared.append((offset, array))
+        offset += array.nbytes
+
+    header = json.dumps({"meta": meta, "arrays": entries}).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    temp_path = f"{path}.{os.getpid()}.tmp"  # Per process, so two writers of the same file never share one
+    with open(temp_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<Q", len(header)))
+        file.write(header)
+        for array_offset, array in prepared:
+            file.seek(data_start + array_offset)
+            file.write(array.tobytes())
+    os.replace(temp_path, path)
+
+
+def read_arrays(path, mmap=True):
+    """Returns (arrays, meta). Arrays are read-only memory maps unless mmap is False."""
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a probes array file")
+        (header_length,) = struct.unpack("<Q", file.read(8))
+        header = json.loads(file.read(header_length))
+    data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        if mmap and np.prod(shape) > 0:
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + entry["offset"], shape=shape)
+        else:
+            count = int(np.prod(shape))
+            with open(path, "rb") as file:
+                file.seek(data_start + entry["offset"])
+                arrays[name] = np.fromfile(file, dtype=dtype, count=count).reshape(shape)
+    return arrays, header["meta"]
+
+
+# --------------------------
+# Stars
+# --------------------------
+def star_arrays(stars):
+    """The `star_*` arrays of a star list, in list order; shared with the galaxy cache."""
+    return {
+        "star_x": np.array([star.x for star in stars], dtype=np.float64),
+        "star_y": np.array([star.y for star in stars], dtype=np.float64),
+        "star_size_mod": np.array([star.size_mod for star in stars], dtype=np.float64),
+        "star_color": np.array([star.color for star in stars], dtype=np.uint8).reshape(len(stars), 3),
+        "star_resources": np.array([star.resources for star in stars],
+                                   dtype=np.int64).reshape(len(stars), len(RESOURCE_TYPES)),
+        "star_visits": np.array([star.visits for star in stars], dtype=np.int64),
+        "star_distance_to_center": np.array([star.distance_to_center for star in stars], dtype=np.float64),
+    }
+
+
+def stars_from_arrays(arrays):
+    """Rebuilds Star objects from `star_arrays` output (or the same arrays memory-mapped from a file)."""
+    stars = []
+    for x, y, size_mod, color, resources, visits, distance in zip(
+            arrays["star_x"].tolist(), arrays["star_y"].tolist(), arrays["star_size_mod"].tolist(),
+            arrays["star_color"].tolist(), arrays["star_resources"].tolist(), arrays["star_visits"].tolist(),
+            arrays["star_distance_to_center"].tolist()):
+        star = Star.__new__(Star)  # Skip __init__: its random colour would be thrown away
+        star.x = x
+        star.y = y
+        star.size_mod = size_mod
+        star.color = tuple(color)
+        star.resources = resources
+        star.visits = visits
+        star.distance_to_center = distance
+        star.index = None
+        stars.append(star)
+    return stars
+
+
+# --------------------------
+# Snapshot
+# --------------------------
+def snapshot(simulation):
+    """Captures the simulation as (arrays, meta). Touches every object once; writing can happen elsewhere."""
+    if simulation.galaxy is not None:
+        raise ValueError("chunked galaxies cannot be checkpointed: their stars come and go, so they have no fixed IDs")
+    simulation.sync_probes()
+    stars = simulation.stars
+    star_ids = {star: star_id for star_id, star in enumerate(stars)}
+    probes = simulation.probes
+    probe_ids = {probe: probe_id for probe_id, probe in enumerate(probes)}
+
+    states = sorted({probe.state for probe in probes})
+    state_codes = {state: code for code, state in enumerate(states)}
+
+    target_kind = np.zeros(len(probes), dtype=np.int8)
+    target_id = np.zeros(len(probes), dtype=np.int64)
+    explorations = []  # ExplorationTarget objects are not shared, so each gets its own row
+    visited_offsets = [0]
+    visited_ids = []
+    cursor_offsets = [0]
+    cursor_peers = []
+    cursor_epochs = []
+    cursor_seen = []
+    for probe_id, probe in enumerate(probes):
+        target = probe.target
+        if isinstance(target, Star):
+            target_kind[probe_id] = TARGET_STAR
+            target_id[probe_id] = star_ids[target]
+        elif isinstance(target, Colony):
+            target_kind[probe_id] = TARGET_COLONY
+        elif isinstance(target, ExplorationTarget):
+            target_kind[probe_id] = TARGET_EXPLORATION
+            target_id[probe_id] = len(explorations)
+            explorations.append((target.x, target.y))
+
+        visited_ids.extend(star_ids[star] for star in probe.visited_log)  # Same stars as visited_stars, in order
+        visited_offsets.append(len(visited_ids))
+        for peer, (epoch, seen) in probe.peer_cursors.items():
+            cursor_peers.append(probe_ids[peer])
+            cursor_epochs.append(-1 if epoch is None else epoch)
+            cursor_seen.append(seen)
+        cursor_offsets.append(len(cursor_peers))
+
+    arrays = {
+        **star_arrays(stars),
+        "probe_x": np.array([probe.x for probe in probes], dtype=np.float64),
+        "probe_y": np.array([probe.y for probe in probes], dtype=np.float64),
+        "probe_speed": np.array([probe.speed for probe in probes], dtype=np.float64),
+        "probe_state": np.array([state_codes[probe.state] for probe in probes], dtype=np.int8),
+        "probe_target_kind": target_kind,
+        "probe_target_id": target_id,
+        "probe_cargo": np.array([probe.cargo for probe in probes],
+                                dtype=np.int64).reshape(len(probes), len(RESOURCE_TYPES)),
+        "probe_max_cargo": np.array([probe.max_cargo for probe in probes],
+                                    dtype=np.int64).reshape(len(probes), len(RESOURCE_TYPES)),
+        "probe_claim": np.array([probe.claim[1] if probe.claim else NO_CLAIM for probe in probes],
+                                dtype=np.int64).reshape(len(probes), len(RESOURCE_TYPES)),
+        "probe_is_mining": np.array([probe.is_mining for probe in probes], dtype=np.bool_),
+        "probe_replication_cooldown": np.array([probe.replication_cooldown for probe in probes], dtype=np.int64),
+        "probe_mining_rate": np.array([probe.mining_rate for probe in probes], dtype=np.int64),
+        "probe_knowledge_epoch": np.array([probe.knowledge_epoch for probe in probes], dtype=np.int64),
+        "visited_offsets": np.array(visited_offsets, dtype=np.int64),
+        "visited_ids": np.array(visited_ids, dtype=np.int64),
+        "cursor_offsets": np.array(cursor_offsets, dtype=np.int64),
+        "cursor_peers": np.array(cursor_peers, dtype=np.int64),
+        "cursor_epochs": np.array(cursor_epochs, dtype=np.int64),
+        "cursor_seen": np.array(cursor_seen, dtype=np.int64),
+        "exploration_xy": np.array(explorations, dtype=np.float64).reshape(len(explorations), 2),
+    }
+    colony = simulation.colony
+    meta = {
+        "version": 1,
+        "tick": simulation.tick,
+        "seed": simulation.seed,
+        "world_width": simulation.world_width,
+        "world_height": simulation.world_height,
+        "vectorised": simulation.vectorised,
+        "config": simulation.config.to_dict(),
+        "states": states,
+        "colony": {field: getattr(colony, field) for field in COLONY_FIELDS},
+        "anomaly_rng_state": colony.rng.getstate(),
+    }
+    return arrays, meta
+
+
+def snapshot_digest(arrays, meta):
+    """SHA-1 of a snapshot, equal for two simulations exactly when their saved state is."""
+    digest = hashlib.sha1(json.dumps(meta, sort_keys=True).encode())
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape}".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def save_checkpoint(simulation, path, background=False):
+    """Saves the simulation to `path`.
+
+    The snapshot is taken immediately; with background=True the file is
+    written on a worker thread, which is returned so callers can join it.
+    """
+    arrays, meta = snapshot(simulation)
+    if not background:
+        write_arrays(path, arrays, meta)
+        return None
+    thread = threading.Thread(target=write_arrays, args=(path, arrays, meta), name="checkpoint-writer")
+    thread.start()
+    return thread
+
+
+# --------------------------
+# Restore
+# --------------------------
+def load_checkpoint(path, restore_random_state=True):
+    """Rebuilds a Simulation from a checkpoint, reconnecting targets, colony and stars by ID."""
+    arrays, meta = read_arrays(path)
+
+    stars = stars_from_arrays(arrays)
+    config = SimConfig.from_dict(meta["config"]) if "config" in meta else None  # Older checkpoints ran on the defaults
+    simulation = Simulation(meta["world_width"], meta["world_height"], len(stars),
+                            vectorised=meta["vectorised"], seed=meta["seed"], stars=stars, config=config)
+    colony = simulation.colony
+    for field, value in meta["colony"].items():
+        setattr(colony, field, value)
+
+    states = meta["states"]
+    explorations = [ExplorationTarget(x, y, colony) for x, y in arrays["exploration_xy"].tolist()]
+    probes = []
+    for x, y, speed in zip(arrays["probe_x"].tolist(), arrays["probe_y"].tolist(), arrays["probe_speed"].tolist()):
+        if speed.is_integer():
+            speed = int(speed)  # Speeds are whole numbers unless someone set a fractional one
+        probes.append(Probe(x, y, stars, colony, speed=speed))
+
+    visited_offsets = arrays["visited_offsets"].tolist()
+    visited_ids = arrays["visited_ids"].tolist()
+    cursor_offsets = arrays["cursor_offsets"].tolist()
+    cursor_peers = arrays["cursor_peers"].tolist()
+    cursor_epochs = arrays["cursor_epochs"].tolist()
+    cursor_seen = arrays["cursor_seen"].tolist()
+    for probe_id, (probe, state, kind, target_id, cargo, max_cargo, is_mining, cooldown, mining_rate, epoch) in enumerate(zip(
+            probes, arrays["probe_state"].tolist(), arrays["probe_target_kind"].tolist(),
+            arrays["probe_target_id"].tolist(), arrays["probe_cargo"].tolist(), arrays["probe_max_cargo"].tolist(),
+            arrays["probe_is_mining"].tolist(), arrays["probe_replication_cooldown"].tolist(),
+            arrays["probe_mining_rate"].tolist(), arrays["probe_knowledge_epoch"].tolist())):
+        probe.state = states[state]
+        if kind == TARGET_STAR:
+            probe.target = stars[target_id]
+        elif kind == TARGET_COLONY:
+            probe.target = colony
+        elif kind == TARGET_EXPLORATION:
+            probe.target = explorations[target_id]
+        probe.cargo = cargo
+        max_cargo = tuple(max_cargo)
+        probe.max_cargo = MAX_CARGO if max_cargo == MAX_CARGO else max_cargo  # Keep sharing the default limits
+        probe.is_mining = is_mining
+        probe.replication_cooldown = cooldown
+        probe.mining_rate = mining_rate
+        probe.knowledge_epoch = epoch
+        probe.visited_log = [stars[star_id] for star_id in visited_ids[visited_offsets[probe_id]:visited_offsets[probe_id + 1]]]
+        probe.visited_stars = set(probe.visited_log)
+        for cursor in range(cursor_offsets[probe_id], cursor_offsets[probe_id + 1]):
+            epoch = cursor_epochs[cursor]
+            probe.peer_cursors[probes[cursor_peers[cursor]]] = (None if epoch < 0 else epoch, cursor_seen[cursor])
+
+    if "probe_claim" in arrays:  # Older checkpoints start with an empty claim book
+        for probe, rates in zip(probes, arrays["probe_claim"].tolist()):
+            if isinstance(probe.target, Star):
+                simulation.colony.star_index.claim(probe, probe.target, rates)
+
+    simulation.probes[:] = probes
+    simulation.tick = meta["tick"]
+    EVENTS.tick = simulation.tick
+    if restore_random_state:
+        if "anomaly_rng_state" in meta:
+            state = meta["anomaly_rng_state"]
+            colony.rng.setstate((state[0], tuple(state[1]), state[2]))
+        else:  # Older checkpoints drew anomaly bonuses from the module RNG
+            state = meta["random_state"]
+            random.setstate((state[0], tuple(state[1]), state[2]))
+    return simulation
@@ -0,0 +1,216 @@
+"""Lazily generated galaxy, cut into square chunks that are built on first access and evicted when unused.
+
+Each chunk's stars come from their own seeded stream, so a chunk is the
+same whenever it is (re)built. Probe searches load the chunks they scan
+through the star index's loader. The viewer only requests the ones it
+draws, and the simulation loads those between ticks, so the star index is
+never changed from another thread while a search walks it. Past
+`max_chunks`, the least recently used chunks that no probe has claimed a
+star in are dropped; what probes mined there is kept per star and
+reapplied when the chunk comes back. Memory then follows the explored area
+and the number of stars mined, not the size of the world:
+
+    simulation = Simulation(1_000_000, 1_000_000, 125_000_000, chunked=True)
+
+A Star object that is still referenced when its chunk comes back (from a
+probe's visited stars, say) is reused rather than rebuilt, so an eviction
+never changes what the simulation does, only what it keeps in memory.
+"""
+import math
+import random
+import threading
+import weakref
+from collections import OrderedDict
+
+from galaxy import place_stars
+from star_index import StarIndex
+
+CHUNK_SIZE = 1000  # World units per side; a multiple of the star index cell size
+MAX_LOADED_CHUNKS = 256  # Chunks kept before the least recently used unclaimed ones are evicted
+SEARCH_RADIUS = 5000  # How far a probe looks for a star; a failed search would otherwise load the whole world
+
+
+# --------------------------
+# Chunked Galaxy Class
+# --------------------------
+class ChunkedGalaxy:
+    """The stars of a world too large to build up front, with the StarIndex probes search in.
+
+    `num_stars` sets the density: a chunk gets its share by area. Iterating
+    or taking len() covers only the stars loaded right now.
+    """
+
+    def __init__(self, world_width, world_height, num_stars, seed, min_distance, star_class,
+                 chunk_size=CHUNK_SIZE, max_chunks=MAX_LOADED_CHUNKS):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.seed = seed
+        self.min_distance = min_distance
+        self.star_class = star_class  # simulation.Star; passed in so this module does not import simulation
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.density = num_stars / (world_width * world_height)
+        self.chunks_x = math.ceil(world_width / chunk_size)
+        self.chunks_y = math.ceil(world_height / chunk_size)
+        self.chunks = OrderedDict()  # (chunk_x, chunk_y) -> stars, least recently used first
+        self.totals = {}  # (chunk_x, chunk_y) -> total resources of each star when loaded, to spot mined ones
+        self.mutations = {}  # (chunk_x, chunk_y) -> {star number: resources}, for evicted chunks
+        self.detached = weakref.WeakValueDictionary()  # (chunk_x, chunk_y, number) -> evicted Star still referenced
+        self.requested = set()  # Chunks the viewer wants, loaded by the simulation between ticks
+        self.loaded_stars = 0
+        self.lock = threading.RLock()  # The viewer reads chunks and queues requests from its own thread
+
+        self.index = StarIndex()
+        index = self.index
+        index.loader = self.ensure
+        # Searches run out to the edges of the world, not of what happens to be loaded
+        index.min_cell_x = index.min_cell_y = 0
+        index.max_cell_x = math.ceil(world_width / index.cell_size) - 1
+        index.max_cell_y = math.ceil(world_height / index.cell_size) - 1
+        index.max_search_ring = SEARCH_RADIUS // index.cell_size
+
+    def __len__(self):
+        return self.loaded_stars
+
+    def __iter__(self):
+        with self.lock:
+            stars = [star for chunk in self.chunks.values() for star in chunk]
+        return iter(stars)
+
+    def chunk_of(self, x, y):
+        return int(x // self.chunk_size), int(y // self.chunk_size)
+
+    # --- Loading ---
+    def ensure(self, min_x, min_y, max_x, max_y):
+        """Loads (and marks as used) every chunk overlapping the box; returns the chunk-aligned box covered.
+
+        Simulation thread only; other threads use `request`.
+        """
+        size = self.chunk_size
+        first_x, first_y = int(min_x // size), int(min_y // size)
+        last_x, last_y = math.ceil(max_x / size) - 1, math.ceil(max_y / size) - 1
+        with self.lock:
+            chunks = self.chunks
+            for chunk_y in range(max(first_y, 0), min(last_y, self.chunks_y - 1) + 1):
+                for chunk_x in range(max(first_x, 0), min(last_x, self.chunks_x - 1) + 1):
+                    key = (chunk_x, chunk_y)
+                    if key in chunks:
+                        chunks.move_to_end(key)
+                    else:
+                        self._load(key)
+        return first_x * size, first_y * size, (last_x + 1) * size, (last_y + 1) * size
+
+    def request(self, min_x, min_y, max_x, max_y):
+        """Queues every unloaded chunk overlapping the box for `load_requested`. True if all are loaded already."""
+        size = self.chunk_size
+        complete = True
+        with self.lock:
+            chunks = self.chunks
+            for chunk_y in range(max(int(min_y // size), 0), min(int(max_y // size), self.chunks_y - 1) + 1):
+                for chunk_x in range(max(int(min_x // size), 0), min(int(max_x // size), self.chunks_x - 1) + 1):
+                    key = (chunk_x, chunk_y)
+                    if key in chunks:
+                        chunks.move_to_end(key)
+                    else:
+                        self.requested.add(key)
+                        complete = False
+        return complete
+
+    def load_requested(self):
+        """Loads the chunks queued by `request`. Call between ticks, on the simulation's thread."""
+        if not self.requested:
+            return
+        with self.lock:
+            for key in self.requested:
+                if key not in self.chunks:
+                    self._load(key)
+            self.requested.clear()
+
+    def stars_in(self, min_x, min_y, max_x, max_y):
+        """The loaded stars inside the box. Does not load anything; see `request`."""
+        size = self.chunk_size
+        stars = []
+        with self.lock:
+            for chunk_y in range(max(int(min_y // size), 0), min(int(max_y // size), self.chunks_y - 1) + 1):
+                for chunk_x in range(max(int(min_x // size), 0), min(int(max_x // size), self.chunks_x - 1) + 1):
+                    for star in self.chunks.get((chunk_x, chunk_y), ()):
+                        if min_x <= star.x < max_x and min_y <= star.y < max_y:
+                            stars.append(star)
+        return stars
+
+    def _generate(self, key):
+        """Builds a chunk's stars from scratch, the same way every time."""
+        chunk_x, chunk_y = key
+        size = self.chunk_size
+        rng = random.Random(f"{self.seed}:chunk:{chunk_x}:{chunk_y}")  # Colours and research, as in generate_galaxy
+        # Keeping half the minimum distance clear at every edge keeps stars of neighbouring chunks apart too
+        margin = self.min_distance / 2
+        x0, y0 = chunk_x * size, chunk_y * size
+        width = min(size, self.world_width - x0) - 2 * margin
+        height = min(size, self.world_height - y0) - 2 * margin
+        if width <= 0 or height <= 0:
+            return []
+        count = round(self.density * width * height)
+        xs, ys, size_mods = place_stars(width, height, count, self.min_distance, seed=rng.getrandbits(64),
+                                        origin=(x0 + margin, y0 + margin),
+                                        noise_size=(self.world_width, self.world_height))
+        center_x = self.world_width // 2
+        center_y = self.world_height // 2
+        stars = []
+        for x, y, size_mod in zip(xs, ys, size_mods):
+            star = self.star_class(x, y, size_mod, rng=rng)
+            star.distance_to_center = math.hypot(x - center_x, y - center_y)
+            stars.append(star)
+        return stars
+
+    def _load(self, key):
+        stars = self._generate(key)
+        mutations = self.mutations.get(key, {})
+        detached = self.detached
+        for number, star in enumerate(stars):
+            previous = detached.pop((key[0], key[1], number), None)
+            if previous is not None:
+                stars[number] = previous  # Probes may still hold it in their visited stars
+            elif number in mutations:
+                star.resources = list(mutations[number])
+        index = self.index
+        for star in stars:
+            index.add(star)
+        self.chunks[key] = stars
+        self.totals[key] = [star.total_resources() for star in stars]
+        self.loaded_stars += len(stars)
+
+    # --- Eviction ---
+    def evict(self):
+        """Drops least recently used chunks down to `max_chunks`. Chunks with a claimed star stay.
+
+        Call between ticks only: a search in progress may be holding a star
+        from any loaded chunk.
+        """
+        chunks = self.chunks
+        if len(chunks) <= self.max_chunks:
+            return
+        with self.lock:
+            pinned = {self.chunk_of(star.x, star.y) for star in self.index.claimed}
+            for key in list(chunks):
+                if len(chunks) <= self.max_chunks:
+                    break
+                if key not in pinned:
+                    self._unload(key)
+
+    def _unload(self, key):
+        stars = self.chunks.pop(key)
+        totals = self.totals.pop(key)
+        index = self.index
+        mutations = {}
+        for number, (star, total) in enumerate(zip(stars, totals)):
+            index.remove(star)
+            if star.total_resources() != total:  # Mining only ever takes, so an unchanged total means untouched
+                mutations[number] = list(star.resources)
+            self.detached[(key[0], key[1], number)] = star
+        earlier = self.mutations.get(key)
+        if earlier:
+            earlier.update(mutations)
+        elif mutations:
+            self.mutations[key] = mutations
+        self.loaded_stars -= len(stars)
@@ -0,0 +1,226 @@
+"""Structured, level-gated simulation events.
+
+Call sites check the level before building an event, so a disabled level
+costs one attribute comparison and no formatting:
+
+    if EVENTS.level <= DEBUG:
+        EVENTS.emit(Mined(...))
+
+Events keep raw values; text is only produced by sinks that want it.
+"""
+import collections
+import json
+import queue
+import sys
+import threading
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+
+LEVEL_NAMES = {"debug": DEBUG, "info": INFO, "warning": WARNING, "off": OFF}
+
+
+# --------------------------
+# Event Types
+# --------------------------
+class Event:
+    __slots__ = ("tick",)
+    kind = "event"
+    level = INFO
+
+    def fields(self):
+        return {name: getattr(self, name) for name in type(self).__slots__}
+
+    def to_dict(self):
+        data = {"kind": self.kind, "tick": self.tick}
+        data.update(self.fields())
+        return data
+
+    def message(self):
+        return f"{self.kind} {self.fields()}"
+
+
+class TargetAssigned(Event):
+    __slots__ = ("x", "y", "target_kind", "target_x", "target_y", "state")
+    kind = "target_assigned"
+    level = DEBUG
+
+    def __init__(self, x, y, target_kind, target_x, target_y, state):
+        self.x, self.y = x, y
+        self.target_kind = target_kind
+        self.target_x, self.target_y = target_x, target_y
+        self.state = state
+
+    def message(self):
+        if self.target_kind == "colony":
+            return f"Probe at ({self.x:.1f}, {self.y:.1f}) returning to colony."
+        return (f"Probe at ({self.x:.1f}, {self.y:.1f}) assigned to {self.target_kind} at "
+                f"({self.target_x:.1f}, {self.target_y:.1f}) for {self.state}")
+
+
+class Mined(Event):
+    __slots__ = ("resource", "amount", "cargo")
+    kind = "mined"
+    level = DEBUG
+
+    def __init__(self, resource, amount, cargo):
+        self.resource = resource
+        self.amount = amount
+        self.cargo = cargo  # Snapshot of the cargo after mining
+
+    def message(self):
+        return f"Probe mined {self.amount} {self.resource} from star. Cargo: {self.cargo}"
+
+
+class MiningStopped(Event):
+    __slots__ = ("x", "y", "resource", "available")
+    kind = "mining_stopped"
+    level = DEBUG
+
+    def __init__(self, x, y, resource, available):
+        self.x, self.y = x, y  # Star position
+        self.resource = resource  # None when the star had nothing the probe needs
+        self.available = available
+
+    def message(self):
+        if self.resource is None:
+            return f"Probe found no suitable resource to mine at star ({self.x:.1f}, {self.y:.1f})."
+        return (f"Star at ({self.x:.1f}, {self.y:.1f}) does not have enough {self.resource} or cargo full. "
+                f"Only {self.available} available.")
+
+
+class StarDepleted(Event):
+    __slots__ = ("x", "y")
+    kind = "star_depleted"
+    level = INFO
+
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+
+    def message(self):
+        return f"Star at ({self.x:.1f}, {self.y:.1f}) is depleted."
+
+
+class Delivered(Event):
+    __slots__ = ("cargo",)
+    kind = "delivered"
+    level = INFO
+
+    def __init__(self, cargo):
+        self.cargo = cargo
+
+    def message(self):
+        return f"Probe delivered resources to colony: {self.cargo}"
+
+
+class AnomalyDiscovered(Event):
+    __slots__ = ("bonus",)
+    kind = "anomaly_discovered"
+    level = INFO
+
+    def __init__(self, bonus):
+        self.bonus = bonus
+
+    def message(self):
+        return f"Probe discovered an anomaly! Bonus resources: {self.bonus} of each type"
+
+
+class LabBuilt(Event):
+    __slots__ = ("labs",)
+    kind = "lab_built"
+    level = INFO
+
+    def __init__(self, labs):
+        self.labs = labs
+
+    def message(self):
+        return f"Research Lab Built! ({self.labs} total)"
+
+
+class UpgradeResearched(Event):
+    __slots__ = ("upgrade",)
+    kind = "upgrade_researched"
+    level = INFO
+
+    def __init__(self, upgrade):
+        self.upgrade = upgrade
+
+    def message(self):
+        return f"{self.upgrade} Upgrade Researched!"
+
+
+# --------------------------
+# Sinks
+# --------------------------
+class ConsoleSink:
+    """Prints each event's message, like the old print() calls did."""
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    def write(self, event):
+        print(event.message(), file=self.stream)
+
+    def close(self):
+        self.stream.flush()
+
+
+class JsonlSink:
+    """Writes events as JSON lines from a background thread; the simulation only enqueues."""
+
+    def __init__(self, path):
+        self.file = open(path, "w")
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="event-jsonl-sink", daemon=True)
+        self.thread.start()
+
+    def write(self, event):
+        self.queue.put(event)
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                break
+            self.file.write(json.dumps(event.to_dict()))
+            self.file.write("\n")
+        self.file.close()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+# --------------------------
+# Event Log
+# --------------------------
+class EventLog:
+    """Keeps the most recent events in a ring buffer and fans them out to sinks."""
+
+    def __init__(self, level=INFO, capacity=1000):
+        self.level = level
+        self.recent = collections.deque(maxlen=capacity)
+        self.sinks = []
+        self.tick = 0  # Stamped onto every event; the simulation advances it
+
+    def emit(self, event):
+        if event.level < self.level:
+            return
+        event.tick = self.tick
+        self.recent.append(event)
+        for sink in self.sinks:
+            sink.write(event)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+
+
+EVENTS = EventLog()
@@ -0,0 +1,66 @@
+"""On-disk cache of generated galaxies, so runs with the same generation parameters skip noise and placement.
+
+A galaxy is stored in the checkpoint array format (see checkpoint.py),
+already sorted by distance to the centre, under a hash of everything
+`generate_galaxy` depends on: seed, world size, star count, minimum star
+distance, resource range and the noise parameters. Loading memory-maps the
+file, so sweep workers reading the same galaxy share its pages:
+
+    stars = load_galaxy(4000, 4000, 2000, seed=7)
+
+A miss generates the galaxy and writes it for next time. The cache is
+best effort: a file that cannot be written or read is regenerated.
+"""
+import hashlib
+import json
+import os
+
+from checkpoint import read_arrays, star_arrays, stars_from_arrays, write_arrays
+from galaxy import DENSITY_THRESHOLD, NOISE_LACUNARITY, NOISE_OCTAVES, NOISE_PERSISTENCE, NOISE_SCALE
+from simulation import MIN_STAR_DISTANCE, STAR_RESOURCE_RANGE, generate_galaxy
+
+GALAXY_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".galaxy_cache")
+CACHE_VERSION = 1  # Bump when generation changes in a way the parameters below do not capture
+
+
+def galaxy_parameters(world_width, world_height, num_stars, seed):
+    """Everything a generated galaxy depends on, as a JSON-serialisable dict."""
+    return {
+        "version": CACHE_VERSION,
+        "seed": seed,
+        "world_width": world_width,
+        "world_height": world_height,
+        "num_stars": num_stars,
+        "min_star_distance": MIN_STAR_DISTANCE,
+        "star_resource_range": list(STAR_RESOURCE_RANGE),
+        "scale": NOISE_SCALE,
+        "octaves": NOISE_OCTAVES,
+        "persistence": NOISE_PERSISTENCE,
+        "lacunarity": NOISE_LACUNARITY,
+        "density_threshold": DENSITY_THRESHOLD,
+    }
+
+
+def galaxy_key(parameters):
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def load_galaxy(world_width, world_height, num_stars, seed, cache_dir=GALAXY_CACHE_DIR):
+    """The galaxy's stars sorted by distance to the centre, from the cache or freshly generated (and then cached)."""
+    parameters = galaxy_parameters(world_width, world_height, num_stars, seed)
+    path = os.path.join(cache_dir, f"galaxy-{galaxy_key(parameters)}.bin")
+    try:
+        arrays, meta = read_arrays(path)
+        if meta.get("parameters") == parameters:  # Guards against a truncated key colliding
+            return stars_from_arrays(arrays)
+    except (OSError, ValueError, KeyError):  # Missing, unreadable or not a galaxy file
+        pass
+
+    stars = generate_galaxy(world_width, world_height, num_stars, seed)
+    stars.sort(key=lambda star: star.distance_to_center)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_arrays(path, star_arrays(stars), {"parameters": parameters})
+    except OSError:
+        pass  # A read-only checkout still runs, just without the cache
+    return stars
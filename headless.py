@@ -0,0 +1,199 @@
+"""Headless runner: steps the simulation as fast as the CPU allows, without pygame."""
+import argparse
+import json
+import math
+import time
+
+from events import EVENTS, LEVEL_NAMES, ConsoleSink, JsonlSink
+from galaxy_cache import GALAXY_CACHE_DIR
+from profiler import PROFILER
+from simulation import NUM_STARS, SimConfig, Simulation
+from timewarp import GOSSIP_INTERVAL, TimeWarp
+
+
+def run_headless(simulation, ticks=None, stop_condition=None, on_tick=None):
+    """Steps the simulation for `ticks` ticks or until `stop_condition(simulation)` is true.
+
+    `on_tick(simulation)` runs after every step, e.g. to write checkpoints.
+    Returns (ticks_run, elapsed_seconds).
+    """
+    if ticks is None and stop_condition is None:
+        raise ValueError("run_headless needs a tick count or a stop condition")
+
+    ticks_run = 0
+    start = time.perf_counter()
+    while ticks is None or ticks_run < ticks:
+        if stop_condition is not None and stop_condition(simulation):
+            break
+        simulation.step()
+        ticks_run += 1
+        if PROFILER.enabled:
+            PROFILER.end_frame()  # One headless frame is one tick
+        if on_tick is not None:
+            on_tick(simulation)
+    elapsed = time.perf_counter() - start
+    return ticks_run, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the colony simulation without a display.")
+    parser.add_argument("--ticks", type=int, default=None, help="Number of ticks to run")
+    parser.add_argument("--stars", type=int, default=None, help="Number of stars in the galaxy (default: %d)" % NUM_STARS)
+    parser.add_argument("--world-width", type=int, default=None)
+    parser.add_argument("--world-height", type=int, default=None)
+    parser.add_argument("--config", default=None,
+                        help="JSON file of SimConfig overrides, e.g. one row of a sweep; the flags above win over it")
+    parser.add_argument("--until-probes", type=int, default=None, help="Stop once this many probes exist")
+    parser.add_argument("--until-labs", type=int, default=None, help="Stop once this many research labs exist")
+    parser.add_argument("--seed", type=int, default=None, help="Galaxy seed (random if omitted)")
+    parser.add_argument("--vectorised", action="store_true", help="Move probes with the NumPy engine")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Generate the galaxy chunk by chunk as probes reach it, for very large worlds")
+    parser.add_argument("--max-chunks", type=int, default=None, help="Chunks kept loaded with --chunked")
+    parser.add_argument("--no-galaxy-cache", action="store_true",
+                        help=f"Always generate the galaxy instead of loading it from {GALAXY_CACHE_DIR}")
+    parser.add_argument("--events", choices=sorted(LEVEL_NAMES), default="info",
+                        help="Lowest event level to record")
+    parser.add_argument("--print-events", action="store_true", help="Print recorded events to stdout")
+    parser.add_argument("--events-jsonl", default=None, help="Also write recorded events to this JSONL file")
+    parser.add_argument("--resume", default=None, help="Continue from this checkpoint instead of a new galaxy")
+    parser.add_argument("--checkpoint", default=None, help="Write checkpoints to this file")
+    parser.add_argument("--checkpoint-every", type=int, default=10000, help="Ticks between checkpoints")
+    parser.add_argument("--warp", action="store_true", help="Skip uneventful ticks with the time-warp scheduler")
+    parser.add_argument("--gossip-interval", type=int, default=None,
+                        help="Ticks between communication rounds with --warp (default: %d)" % GOSSIP_INTERVAL)
+    parser.add_argument("--record", default=None, help="Record the run into this directory for replay.py")
+    parser.add_argument("--keyframe-every", type=int, default=None, help="Ticks between keyframes with --record")
+    parser.add_argument("--stats", default=None, help="Stream run statistics to this file (.csv for CSV, else JSONL)")
+    parser.add_argument("--stats-every", type=int, default=None, help="Ticks between statistics samples")
+    parser.add_argument("--profile", default=None, help="Time each tick phase and write the summary to this JSON file")
+    parser.add_argument("--profile-window", type=int, default=None, help="Ticks kept for the rolling percentiles")
+    parser.add_argument("--spectate", type=int, default=None, metavar="PORT",
+                        help="Stream the run to spectator.py viewers on this local port")
+    args = parser.parse_args()
+
+    conditions = []
+    if args.until_probes is not None:
+        conditions.append(lambda sim: len(sim.probes) >= args.until_probes)
+    if args.until_labs is not None:
+        conditions.append(lambda sim: sim.colony.research_labs >= args.until_labs)
+    stop_condition = None
+    if conditions:
+        stop_condition = lambda sim: any(condition(sim) for condition in conditions)
+    if args.ticks is None and stop_condition is None:
+        parser.error("give --ticks and/or a stop condition (--until-probes, --until-labs)")
+    if args.record and args.warp:
+        parser.error("--record needs plain stepping; a warped run does not replay tick for tick")
+    if args.chunked and (args.record or args.checkpoint or args.resume):
+        parser.error("--chunked runs cannot be checkpointed, recorded or resumed")
+    if args.chunked and args.spectate is not None:
+        parser.error("--chunked runs cannot be spectated")
+
+    EVENTS.level = LEVEL_NAMES[args.events]
+    if args.print_events:
+        EVENTS.add_sink(ConsoleSink())
+    if args.events_jsonl:
+        EVENTS.add_sink(JsonlSink(args.events_jsonl))
+
+    if args.profile:
+        if args.profile_window is not None:
+            PROFILER.window = args.profile_window
+        PROFILER.enabled = True
+
+    if args.resume:
+        from checkpoint import load_checkpoint
+        simulation = load_checkpoint(args.resume)
+    else:
+        config = None
+        if args.config:
+            with open(args.config) as file:
+                config = SimConfig(**json.load(file))
+        simulation = Simulation(args.world_width, args.world_height, args.stars, vectorised=args.vectorised,
+                                seed=args.seed, config=config, chunked=args.chunked,
+                                galaxy_cache=None if args.no_galaxy_cache else GALAXY_CACHE_DIR)
+        if args.max_chunks is not None and simulation.galaxy is not None:
+            simulation.galaxy.max_chunks = args.max_chunks
+
+    callbacks = []
+    writer = None
+    if args.checkpoint:
+        from checkpoint import save_checkpoint
+
+        def write_checkpoint(sim):
+            nonlocal writer
+            if sim.tick % args.checkpoint_every == 0:
+                if writer is not None:
+                    writer.join()  # Never have two writes of the same file in flight
+                writer = save_checkpoint(sim, args.checkpoint, background=True)
+
+        callbacks.append(write_checkpoint)
+
+    exporter = None
+    if args.stats:
+        from stats import STATS, STATS_EVERY, StatsExporter
+        STATS.attach(simulation)
+        exporter = StatsExporter(STATS, args.stats, STATS_EVERY if args.stats_every is None else args.stats_every)
+        callbacks.append(exporter.on_tick)
+
+    recorder = None
+    if args.record:
+        from replay import KEYFRAME_EVERY, Recorder
+        recorder = Recorder(args.record, simulation,
+                            KEYFRAME_EVERY if args.keyframe_every is None else args.keyframe_every)
+        callbacks.append(recorder.on_tick)
+
+    spectator = None
+    if args.spectate is not None:
+        from spectator import SpectatorServer
+        spectator = SpectatorServer(simulation, args.spectate)
+        print(f"Spectators can connect to 127.0.0.1:{spectator.port}")
+        callbacks.append(spectator.on_tick)
+
+    on_tick = None
+    if len(callbacks) == 1:
+        on_tick = callbacks[0]
+    elif callbacks:
+        def on_tick(sim):
+            for callback in callbacks:
+                callback(sim)
+
+    try:
+        if args.warp:
+            warp = TimeWarp(simulation, GOSSIP_INTERVAL if args.gossip_interval is None else args.gossip_interval)
+            start = time.perf_counter()
+            sync_interval = args.checkpoint_every if args.checkpoint else None
+            if exporter is not None:  # Settle on every sample tick as well
+                sync_interval = math.gcd(sync_interval or exporter.every, exporter.every)
+            if spectator is not None:  # Settle often enough for a smooth picture
+                from spectator import WARP_SYNC
+                sync_interval = math.gcd(sync_interval or WARP_SYNC, WARP_SYNC)
+            ticks_run = warp.run(args.ticks, stop_condition, on_tick, sync_interval=sync_interval)
+            elapsed = time.perf_counter() - start
+        else:
+            ticks_run, elapsed = run_headless(simulation, args.ticks, stop_condition, on_tick)
+    finally:
+        EVENTS.close()
+        if writer is not None:
+            writer.join()
+        if recorder is not None:
+            recorder.close(simulation.tick)
+        if exporter is not None:
+            exporter.close(simulation.tick)
+        if spectator is not None:
+            spectator.close()
+
+    colony = simulation.colony
+    print(f"Ran {ticks_run} ticks in {elapsed:.2f}s ({ticks_run / elapsed if elapsed > 0 else float('inf'):.1f} ticks/s)")
+    print(f"Probes: {len(simulation.probes)}, Labs: {colony.research_labs}")
+    print(f"Colony: Min={colony.minerals}, Gas={colony.gases}, Energy={colony.energy}, Research={colony.research}")
+    if args.profile:
+        PROFILER.export(args.profile)
+        summary = PROFILER.summary()
+        for name, stats in summary["phases"].items():
+            print(f"{name:>17}: p50 {stats['p50_ms']:.3f} ms, p99 {stats['p99_ms']:.3f} ms, total {stats['total_ms'] / 1000:.2f}s")
+        for name, stats in summary["counters"].items():
+            print(f"{name:>17}: p50 {stats['p50']}, p99 {stats['p99']}, total {stats['total']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Per-phase frame profiling with rolling percentiles.
+
+Like the event log, the profiler is a module-level object that call sites
+check before doing any work, so a disabled profiler costs one attribute
+lookup per phase:
+
+    if PROFILER.enabled:
+        PROFILER.count("find_star")
+
+Phases are timed with `with PROFILER.phase("name"):` and counters are
+summed per frame; `end_frame()` closes a frame and pushes both into
+rolling windows that `summary()` reports as p50/p99.
+"""
+import collections
+import json
+import math
+import time
+
+PROFILER_WINDOW = 300  # Frames kept for the rolling percentiles
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted sequence; 0 for an empty one."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+# --------------------------
+# Profiler Class
+# --------------------------
+class Profiler:
+    """Collects phase times and counters per frame.
+
+    A phase entered several times in one frame (e.g. once per probe) is
+    summed into a single sample for that frame.
+    """
+
+    def __init__(self, window=PROFILER_WINDOW, enabled=False):
+        self.enabled = enabled
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.frame_times = {}  # Phase -> seconds spent in the current frame
+        self.frame_counts = {}  # Counter -> amount in the current frame
+        self.phase_samples = {}  # Phase -> deque of per-frame seconds
+        self.counter_samples = {}  # Counter -> deque of per-frame amounts
+        self.phase_totals = {}
+        self.counter_totals = {}
+
+    def phase(self, name):
+        """Context manager timing a block under `name`; a shared no-op while disabled."""
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def add_time(self, name, seconds):
+        self.frame_times[name] = self.frame_times.get(name, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        self.frame_counts[name] = self.frame_counts.get(name, 0) + amount
+
+    def end_frame(self):
+        """Closes the current frame, moving its times and counts into the rolling windows."""
+        if not self.enabled:
+            return
+        # Swapped out first, so a simulation thread can keep adding to fresh dicts meanwhile
+        frame_times, self.frame_times = self.frame_times, {}
+        frame_counts, self.frame_counts = self.frame_counts, {}
+        self.frames += 1
+        for name, seconds in frame_times.items():
+            self._window(self.phase_samples, name).append(seconds)
+            self.phase_totals[name] = self.phase_totals.get(name, 0.0) + seconds
+        for name, amount in frame_counts.items():
+            self._window(self.counter_samples, name).append(amount)
+            self.counter_totals[name] = self.counter_totals.get(name, 0) + amount
+        # Phases or counters that did not fire this frame still record a zero
+        for name, samples in self.phase_samples.items():
+            if name not in frame_times:
+                samples.append(0.0)
+        for name, samples in self.counter_samples.items():
+            if name not in frame_counts:
+                samples.append(0)
+
+    def _window(self, windows, name):
+        samples = windows.get(name)
+        if samples is None:
+            samples = windows[name] = collections.deque(maxlen=self.window)
+        return samples
+
+    def summary(self):
+        """Returns a JSON-serialisable dict of rolling p50/p99 and run totals per phase and counter."""
+        phases = {}
+        for name, samples in self.phase_samples.items():
+            phases[name] = {
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000,
+                "total_ms": self.phase_totals.get(name, 0.0) * 1000,
+            }
+        counters = {}
+        for name, samples in self.counter_samples.items():
+            counters[name] = {
+                "p50": percentile(samples, 0.50),
+                "p99": percentile(samples, 0.99),
+                "total": self.counter_totals.get(name, 0),
+            }
+        return {"frames": self.frames, "window": self.window, "phases": phases, "counters": counters}
+
+    def export(self, path):
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+
+PROFILER = Profiler()
@@ -0,0 +1,302 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from galaxy import DENSITY_THRESHOLD
+
+# --------------------------
+# Display Configuration
+# --------------------------
+WIDTH, HEIGHT = 1200, 900
+FRAME_RATE = 60  # Display refresh cap; the simulation thread keeps its own rate
+BACKGROUND_COLOR = (0, 0, 20)
+STAR_TILE_SIZE = 256  # Screen pixels per cached star tile
+STAR_TILE_CACHE_LIMIT = 160  # Tiles kept across zoom levels before the least recently used go
+STAR_BUCKET_SIZE = 200  # World pixels per bucket when looking up the stars of a tile
+OVERLAY_COLOR = (255, 255, 0)
+LOD_ZOOM = 0.5  # Below this zoom, probes go into a density texture instead of being drawn one by one
+DENSITY_CELL_SIZE = 3  # Screen pixels per density texel
+LINE_SAMPLES_MAX = 128  # Samples per target line in the density texture; longer lines are sampled more sparsely
+
+
+# --------------------------
+# Drawing Functions
+# --------------------------
+def star_draw_color(star):
+    if star.total_resources() > 0:
+        return star.color
+    return tuple(channel // 3 for channel in star.color)  # Depleted stars fade out
+
+
+def draw_star(star, screen, offset_x, offset_y, zoom_level):
+    radius = 3 * zoom_level * star.size_mod
+    draw_x = int((star.x - offset_x) * zoom_level)
+    draw_y = int((star.y - offset_y) * zoom_level)
+    if 0 - radius <= draw_x <= WIDTH + radius and 0 - radius <= draw_y <= HEIGHT + radius:
+        pygame.draw.circle(screen, star_draw_color(star), (draw_x, draw_y), radius)  # Use the star's color
+
+
+def draw_colony(colony, screen, offset_x, offset_y, zoom_level):
+    radius = 10 * zoom_level
+    draw_x = int((colony.x - offset_x) * zoom_level)
+    draw_y = int((colony.y - offset_y) * zoom_level)
+    if 0 - radius <= draw_x <= WIDTH + radius and 0 - radius <= draw_y <= HEIGHT + radius:
+        pygame.draw.circle(screen, (0, 0, 255), (draw_x, draw_y), radius)
+
+
+def draw_probe(probe, screen, offset_x, offset_y, zoom_level):
+    target = probe.target
+    if target:
+        draw_probe_at(probe.x, probe.y, target.x, target.y, screen, offset_x, offset_y, zoom_level)
+    else:
+        draw_probe_at(probe.x, probe.y, None, None, screen, offset_x, offset_y, zoom_level)
+
+
+def draw_probe_at(x, y, target_x, target_y, screen, offset_x, offset_y, zoom_level):
+    """Draws a probe from plain coordinates, e.g. a snapshot's; target_x is None without a target."""
+    radius = 5 * zoom_level
+    draw_x = int((x - offset_x) * zoom_level)
+    draw_y = int((y - offset_y) * zoom_level)
+    if 0 - radius <= draw_x <= WIDTH + radius and 0 - radius <= draw_y <= HEIGHT + radius:
+        pygame.draw.circle(screen, (0, 255, 0), (draw_x, draw_y), radius)
+    if target_x is not None:
+        target_draw_x = int((target_x - offset_x) * zoom_level)
+        target_draw_y = int((target_y - offset_y) * zoom_level)
+        pygame.draw.line(
+            screen,
+            (255, 0, 0),
+            (draw_x, draw_y),
+            (target_draw_x, target_draw_y),
+            int(1 * max(zoom_level, 0.1)),
+        )
+
+
+def visible_probes(xs, ys, target_xs, target_ys, has_target, offset_x, offset_y, zoom_level, width=WIDTH, height=HEIGHT):
+    """Indices of the probes whose body or target line can touch the screen, from a snapshot's arrays."""
+    margin = 5  # Probe radius, in world units at any zoom
+    left = offset_x - margin
+    top = offset_y - margin
+    right = offset_x + width / zoom_level + margin
+    bottom = offset_y + height / zoom_level + margin
+    end_xs = np.where(has_target, target_xs, xs)
+    end_ys = np.where(has_target, target_ys, ys)
+    return np.flatnonzero((np.minimum(xs, end_xs) <= right) & (np.maximum(xs, end_xs) >= left) &
+                          (np.minimum(ys, end_ys) <= bottom) & (np.maximum(ys, end_ys) >= top))
+
+
+def draw_probes(screen, density_layer, xs, ys, target_xs, target_ys, has_target, offset_x, offset_y, zoom_level):
+    """Draws every probe from a snapshot's arrays: one density texture below LOD_ZOOM, else probe by probe."""
+    if zoom_level < LOD_ZOOM:  # Too small to tell apart; one density texture for all of them
+        density_layer.draw(screen, xs, ys, target_xs, target_ys, has_target, offset_x, offset_y, zoom_level)
+        return
+    visible = visible_probes(xs, ys, target_xs, target_ys, has_target, offset_x, offset_y, zoom_level)
+    for x, y, targeted, target_x, target_y in zip(xs[visible].tolist(), ys[visible].tolist(),
+                                                  has_target[visible].tolist(),
+                                                  target_xs[visible].tolist(), target_ys[visible].tolist()):
+        if targeted:
+            draw_probe_at(x, y, target_x, target_y, screen, offset_x, offset_y, zoom_level)
+        else:
+            draw_probe_at(x, y, None, None, screen, offset_x, offset_y, zoom_level)
+
+
+def draw_profiler_overlay(profiler, screen, font):
+    """Lists each profiled phase's rolling p50/p99 and the per-frame counters in the top-right corner."""
+    summary = profiler.summary()
+    lines = [f"{'phase':<14}{'p50 ms':>8}{'p99 ms':>8}"]
+    for name, stats in summary["phases"].items():
+        lines.append(f"{name:<14}{stats['p50_ms']:8.2f}{stats['p99_ms']:8.2f}")
+    for name, stats in summary["counters"].items():
+        lines.append(f"{name:<14}{stats['p50']:8}{stats['p99']:8}")
+    line_height = font.get_linesize()
+    for row, line in enumerate(lines):
+        surface = font.render(line, True, OVERLAY_COLOR)
+        screen.blit(surface, (WIDTH - 10 - surface.get_width(), 10 + row * line_height))
+
+
+# --------------------------
+# Star Layer Class
+# --------------------------
+class StarLayer:
+    """Pre-rendered star field, cut into screen-sized tiles per zoom level.
+
+    Stars never move, so each tile is drawn once per zoom level and then
+    only blitted while panning. `mark_dirty(star)` drops the cached tiles a
+    star overlaps, and they are redrawn the next time they come into view.
+
+    Given a chunked galaxy instead of a star list, tiles ask it for their
+    stars and request the chunks the camera looks at, which the simulation
+    loads between ticks. A tile is cached only once all its chunks are in.
+    """
+
+    def __init__(self, stars, tile_size=STAR_TILE_SIZE, cache_limit=STAR_TILE_CACHE_LIMIT):
+        self.tile_size = tile_size
+        self.cache_limit = cache_limit
+        self.tiles = OrderedDict()  # (zoom_key, tile_x, tile_y) -> Surface, least recently used first
+        self.dirty_stars = set()
+        self.buckets = {}  # (bucket_x, bucket_y) -> stars, in world space
+        self.max_star_radius = 3.0  # World-space radius of the largest star
+        self.galaxy = stars if hasattr(stars, "stars_in") else None
+        if self.galaxy is not None:  # Unloaded stars are unknown, so allow for the largest size_mod there can be
+            self.max_star_radius = 3 * (1.0 + (1 - DENSITY_THRESHOLD) * 0.5)
+            return
+        for star in stars:
+            key = (int(star.x // STAR_BUCKET_SIZE), int(star.y // STAR_BUCKET_SIZE))
+            self.buckets.setdefault(key, []).append(star)
+            self.max_star_radius = max(self.max_star_radius, 3 * star.size_mod)
+
+    def mark_dirty(self, star):
+        """Schedules the tiles under `star` for a redraw, e.g. after it changed colour."""
+        self.dirty_stars.add(star)
+
+    @staticmethod
+    def zoom_key(zoom_level):
+        return round(zoom_level, 2)  # The viewer zooms in 0.1 steps; this absorbs float drift
+
+    def _invalidate_dirty(self):
+        zoom_keys = {key[0] for key in self.tiles}
+        for star in self.dirty_stars:
+            for zoom_key in zoom_keys:
+                world_tile = self.tile_size / zoom_key
+                first_x = int((star.x - self.max_star_radius) // world_tile)
+                last_x = int((star.x + self.max_star_radius) // world_tile)
+                first_y = int((star.y - self.max_star_radius) // world_tile)
+                last_y = int((star.y + self.max_star_radius) // world_tile)
+                for tile_x in range(first_x, last_x + 1):
+                    for tile_y in range(first_y, last_y + 1):
+                        self.tiles.pop((zoom_key, tile_x, tile_y), None)
+        self.dirty_stars.clear()
+
+    def _render_tile(self, zoom_key, tile_x, tile_y):
+        """Returns the tile and whether it is final (False while chunks it covers are still loading)."""
+        tile = pygame.Surface((self.tile_size, self.tile_size))
+        tile.fill(BACKGROUND_COLOR)
+        world_tile = self.tile_size / zoom_key
+        origin_x = tile_x * world_tile
+        origin_y = tile_y * world_tile
+        margin = self.max_star_radius
+        if self.galaxy is not None:
+            box = (origin_x - margin, origin_y - margin, origin_x + world_tile + margin, origin_y + world_tile + margin)
+            complete = self.galaxy.request(*box)
+            for star in self.galaxy.stars_in(*box):
+                draw_star(star, tile, origin_x, origin_y, zoom_key)
+            return tile, complete
+        first_x = int((origin_x - margin) // STAR_BUCKET_SIZE)
+        last_x = int((origin_x + world_tile + margin) // STAR_BUCKET_SIZE)
+        first_y = int((origin_y - margin) // STAR_BUCKET_SIZE)
+        last_y = int((origin_y + world_tile + margin) // STAR_BUCKET_SIZE)
+        for bucket_x in range(first_x, last_x + 1):
+            for bucket_y in range(first_y, last_y + 1):
+                for star in self.buckets.get((bucket_x, bucket_y), ()):
+                    draw_star(star, tile, origin_x, origin_y, zoom_key)  # Clipped to the tile by pygame
+        return tile, True
+
+    def _tile(self, zoom_key, tile_x, tile_y):
+        key = (zoom_key, tile_x, tile_y)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile, complete = self._render_tile(zoom_key, tile_x, tile_y)
+            if complete:
+                self.tiles[key] = tile
+                if len(self.tiles) > self.cache_limit:
+                    self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def draw(self, screen, offset_x, offset_y, zoom_level):
+        """Blits the visible tiles; replaces filling the background and drawing every star."""
+        if self.dirty_stars:
+            self._invalidate_dirty()
+        zoom_key = self.zoom_key(zoom_level)
+        origin_x = offset_x * zoom_key  # Screen origin in zoomed world pixels
+        origin_y = offset_y * zoom_key
+        first_x = math.floor(origin_x / self.tile_size)
+        first_y = math.floor(origin_y / self.tile_size)
+        last_x = math.floor((origin_x + screen.get_width()) / self.tile_size)
+        last_y = math.floor((origin_y + screen.get_height()) / self.tile_size)
+        for tile_x in range(first_x, last_x + 1):
+            for tile_y in range(first_y, last_y + 1):
+                screen.blit(
+                    self._tile(zoom_key, tile_x, tile_y),
+                    (round(tile_x * self.tile_size - origin_x), round(tile_y * self.tile_size - origin_y)),
+                )
+
+
+# --------------------------
+# Probe Density Layer Class
+# --------------------------
+class ProbeDensityLayer:
+    """Probes and their target lines as one additive heat texture, for zoomed-out views.
+
+    Probe positions and points sampled along every target line are counted
+    per texel with NumPy, turned into green (probes) and red (lines) on a
+    log scale, written to a surface through pygame.surfarray and added to
+    the frame in one scaled blit. Only the box of texels anything landed in
+    is coloured and blitted, so a frame costs a few array passes over the
+    probes plus at most one screen-sized texture, however many probes there are.
+    """
+
+    def __init__(self, width=WIDTH, height=HEIGHT, cell_size=DENSITY_CELL_SIZE):
+        self.cell_size = cell_size
+        self.size = (math.ceil(width / cell_size), math.ceil(height / cell_size))
+        self.texture = pygame.Surface(self.size, 0, 32)
+        # Count -> mapped pixel value, so colouring a frame is two lookups and an OR
+        red_shift, green_shift = self.texture.get_shifts()[:2]
+        self.line_shades = self._shades(70, 30).astype(np.uint32) << red_shift
+        self.probe_shades = self._shades(120, 45).astype(np.uint32) << green_shift
+
+    @staticmethod
+    def _shades(base, gain):
+        """Brightness by count (capped at 255): 0 for none, then brighter with every doubling."""
+        shades = np.minimum(255, base + gain * np.log2(np.maximum(np.arange(256), 1))).astype(np.uint8)
+        shades[0] = 0
+        return shades
+
+    @staticmethod
+    def _line_samples(start_xs, start_ys, end_xs, end_ys):
+        """Points spread evenly along each line, about one per texel up to LINE_SAMPLES_MAX."""
+        lengths = np.hypot(end_xs - start_xs, end_ys - start_ys)
+        counts = np.clip(np.ceil(lengths).astype(np.int64), 1, LINE_SAMPLES_MAX)
+        line = np.repeat(np.arange(len(counts)), counts)
+        step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        t = (step + 0.5) / counts[line]
+        return (start_xs[line] + (end_xs - start_xs)[line] * t,
+                start_ys[line] + (end_ys - start_ys)[line] * t)
+
+    def _texels(self, texel_xs, texel_ys):
+        """Whole texel coordinates of the samples that land on the texture."""
+        width, height = self.size
+        xs = np.floor(texel_xs).astype(np.int64)
+        ys = np.floor(texel_ys).astype(np.int64)
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        return xs[inside], ys[inside]
+
+    def _counts(self, xs, ys):
+        width, height = self.size
+        return np.bincount(xs * height + ys, minlength=width * height).reshape(width, height)
+
+    def draw(self, screen, xs, ys, target_xs, target_ys, has_target, offset_x, offset_y, zoom_level):
+        """Adds the probes to the frame; takes the same arrays as a snapshot holds."""
+        scale = zoom_level / self.cell_size  # World units to texels
+        texel_xs = (xs - offset_x) * scale
+        texel_ys = (ys - offset_y) * scale
+        probe_xs, probe_ys = self._texels(texel_xs, texel_ys)
+        line_xs, line_ys = self._texels(*self._line_samples(texel_xs[has_target], texel_ys[has_target],
+                                                            (target_xs[has_target] - offset_x) * scale,
+                                                            (target_ys[has_target] - offset_y) * scale))
+        if not len(probe_xs) and not len(line_xs):
+            return
+        all_xs = np.concatenate((probe_xs, line_xs))
+        all_ys = np.concatenate((probe_ys, line_ys))
+        left, top = int(all_xs.min()), int(all_ys.min())
+        right, bottom = int(all_xs.max()) + 1, int(all_ys.max()) + 1
+        box = (slice(left, right), slice(top, bottom))
+        pixels = (self.line_shades[np.minimum(self._counts(line_xs, line_ys)[box], 255)] |
+                  self.probe_shades[np.minimum(self._counts(probe_xs, probe_ys)[box], 255)])
+        area = self.texture.subsurface((left, top, right - left, bottom - top))
+        pygame.surfarray.blit_array(area, pixels)  # Indexed [x, y], as surfarray expects
+        cell_size = self.cell_size
+        scaled = pygame.transform.scale(area, ((right - left) * cell_size, (bottom - top) * cell_size))
+        screen.blit(scaled, (left * cell_size, top * cell_size), special_flags=pygame.BLEND_ADD)
@@ -0,0 +1,236 @@
+"""Deterministic recording and replay of simulation runs.
+
+Everything random in a run is drawn from streams seeded by the run's seed,
+so the seed alone regenerates the world tick for tick. A recording is a
+directory with:
+
+    header.json              seed, run config (world size, star count, rules) and engine
+    inputs.jsonl             one {"tick", "kind", ...} line per user input (camera moves, overlay toggles)
+    keyframes.jsonl          tick, file and state digest of every keyframe
+    keyframe_<tick>.ckpt     checkpoints written every `keyframe_every` ticks
+
+Keyframes only make seeking cheap and let a replay prove it is still on
+track; the run itself is regenerated by stepping:
+
+    python replay.py runs/latest --seek 25000 --ticks 5000 --profile replay.json
+    python replay.py runs/latest --verify
+"""
+import argparse
+import bisect
+import json
+import os
+import threading
+import time
+
+from checkpoint import load_checkpoint, snapshot, snapshot_digest, write_arrays
+from events import EVENTS, LEVEL_NAMES
+from headless import run_headless
+from profiler import PROFILER
+from simulation import SimConfig, Simulation
+
+RECORDING_VERSION = 1
+KEYFRAME_EVERY = 5000  # Ticks between keyframes; seeking replays at most this many ticks
+
+
+def _keyframe_name(tick):
+    return f"keyframe_{tick:09d}.ckpt"
+
+
+# --------------------------
+# Recorder Class
+# --------------------------
+class Recorder:
+    """Writes a recording of `simulation` from its current tick on.
+
+    Call `record()` for every user input before the tick it applies to is
+    stepped, `on_tick()` after every step, and `close()` at the end.
+    """
+
+    def __init__(self, path, simulation, keyframe_every=KEYFRAME_EVERY):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self.writer = None
+        header = {
+            "version": RECORDING_VERSION,
+            "seed": simulation.seed,
+            "world_width": simulation.world_width,
+            "world_height": simulation.world_height,
+            "num_stars": len(simulation.stars),
+            "vectorised": simulation.vectorised,
+            "config": simulation.config.to_dict(),
+            "start_tick": simulation.tick,
+            "keyframe_every": keyframe_every,
+        }
+        with open(os.path.join(path, "header.json"), "w") as file:
+            json.dump(header, file, indent=2)
+        self.inputs = open(os.path.join(path, "inputs.jsonl"), "w")
+        self.keyframes = open(os.path.join(path, "keyframes.jsonl"), "w")
+        self.keyframe(simulation)  # A resumed run cannot be regenerated from the seed, so always keep its start
+
+    def record(self, tick, kind, **data):
+        self.inputs.write(json.dumps({"tick": tick, "kind": kind, **data}) + "\n")
+
+    def on_tick(self, simulation):
+        if simulation.tick % self.keyframe_every == 0:
+            self.keyframe(simulation)
+
+    def keyframe(self, simulation):
+        """Snapshots the simulation now and writes it on a worker thread."""
+        arrays, meta = snapshot(simulation)
+        name = _keyframe_name(simulation.tick)
+        entry = {"tick": simulation.tick, "file": name, "digest": snapshot_digest(arrays, meta)}
+        self.keyframes.write(json.dumps(entry) + "\n")
+        self.keyframes.flush()
+        if self.writer is not None:
+            self.writer.join()
+        self.writer = threading.Thread(target=write_arrays, args=(os.path.join(self.path, name), arrays, meta),
+                                       name="keyframe-writer")
+        self.writer.start()
+
+    def close(self, tick):
+        """Marks the end of the run at `tick` and finishes any keyframe still being written."""
+        self.record(tick, "end")
+        self.inputs.close()
+        self.keyframes.close()
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+
+
+# --------------------------
+# Replayer Class
+# --------------------------
+class Replayer:
+    """Regenerates a recorded run and seeks within it through the nearest keyframe."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "header.json")) as file:
+            self.header = json.load(file)
+        if self.header["version"] != RECORDING_VERSION:
+            raise ValueError(f"{path} is a version {self.header['version']} recording, expected {RECORDING_VERSION}")
+        self.inputs = {}  # Tick -> inputs applied before that tick is stepped
+        self.camera_ticks = []  # Tick of every camera input, in order
+        self.cameras = []
+        self.end_tick = None
+        with open(os.path.join(path, "inputs.jsonl")) as file:
+            for line in file:
+                entry = json.loads(line)
+                if entry["kind"] == "end":
+                    self.end_tick = entry["tick"]
+                    continue
+                self.inputs.setdefault(entry["tick"], []).append(entry)
+                if entry["kind"] == "camera":
+                    self.camera_ticks.append(entry["tick"])
+                    self.cameras.append(entry)
+        with open(os.path.join(path, "keyframes.jsonl")) as file:
+            self.keyframes = [json.loads(line) for line in file]
+        self.keyframe_ticks = [keyframe["tick"] for keyframe in self.keyframes]
+        if self.end_tick is None:  # The recording process died before close(); play up to the last keyframe
+            self.end_tick = self.keyframe_ticks[-1]
+
+    @property
+    def start_tick(self):
+        return self.header["start_tick"]
+
+    def regenerate(self):
+        """The simulation at the recording's first tick, rebuilt from the seed when it started fresh."""
+        header = self.header
+        if header["start_tick"] != 0:
+            return self.load_keyframe(self.keyframes[0])
+        config = SimConfig.from_dict(header["config"]) if "config" in header else None
+        return Simulation(header["world_width"], header["world_height"], header["num_stars"],
+                          vectorised=header["vectorised"], seed=header["seed"], config=config)
+
+    def load_keyframe(self, keyframe):
+        return load_checkpoint(os.path.join(self.path, keyframe["file"]))
+
+    def seek(self, tick):
+        """Returns the simulation as it was at `tick`, stepping forward from the nearest earlier keyframe."""
+        if not self.start_tick <= tick <= self.end_tick:
+            raise ValueError(f"tick {tick} is outside the recording ({self.start_tick}..{self.end_tick})")
+        position = bisect.bisect_right(self.keyframe_ticks, tick) - 1
+        simulation = self.load_keyframe(self.keyframes[position])
+        while simulation.tick < tick:
+            simulation.step()
+        return simulation
+
+    def camera_at(self, tick):
+        """The last recorded camera input at or before `tick`, or None."""
+        position = bisect.bisect_right(self.camera_ticks, tick) - 1
+        return self.cameras[position] if position >= 0 else None
+
+    def play(self, simulation, ticks=None, on_tick=None):
+        """Steps `simulation` as fast as the CPU allows, up to `ticks` ticks or the end of the recording.
+
+        Returns (ticks_run, elapsed_seconds).
+        """
+        end = self.end_tick if ticks is None else min(self.end_tick, simulation.tick + ticks)
+        return run_headless(simulation, max(0, end - simulation.tick), on_tick=on_tick)
+
+    def verify(self, log=None):
+        """Regenerates the whole run and compares it against every keyframe digest.
+
+        Returns the ticks whose state differs from the recording; an empty
+        list means the replay is bit-for-bit identical.
+        """
+        simulation = self.regenerate()
+        mismatches = []
+        for keyframe in self.keyframes:
+            while simulation.tick < keyframe["tick"]:
+                simulation.step()
+            matches = snapshot_digest(*snapshot(simulation)) == keyframe["digest"]
+            if not matches:
+                mismatches.append(keyframe["tick"])
+            if log is not None:
+                log(keyframe["tick"], matches)
+        return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded run headless, at full CPU speed.")
+    parser.add_argument("recording", help="Recording directory written by main.py or headless.py --record")
+    parser.add_argument("--seek", type=int, default=None, help="Start from this tick (default: the first one)")
+    parser.add_argument("--ticks", type=int, default=None, help="Ticks to play (default: to the end)")
+    parser.add_argument("--verify", action="store_true", help="Regenerate the run and check every keyframe")
+    parser.add_argument("--events", choices=sorted(LEVEL_NAMES), default="off", help="Lowest event level to record")
+    parser.add_argument("--profile", default=None, help="Time each tick phase and write the summary to this JSON file")
+    args = parser.parse_args()
+
+    EVENTS.level = LEVEL_NAMES[args.events]
+    replayer = Replayer(args.recording)
+
+    if args.verify:
+        def log(tick, matches):
+            print(f"tick {tick:>9}: {'ok' if matches else 'MISMATCH'}")
+
+        mismatches = replayer.verify(log)
+        if mismatches:
+            raise SystemExit(f"Replay diverged from the recording at ticks {mismatches}")
+        print(f"Replay matches all {len(replayer.keyframes)} keyframes")
+        return
+
+    start = time.perf_counter()
+    simulation = replayer.seek(replayer.start_tick if args.seek is None else args.seek)
+    print(f"Seeked to tick {simulation.tick} in {time.perf_counter() - start:.2f}s")
+
+    if args.profile:
+        PROFILER.enabled = True
+    try:
+        ticks_run, elapsed = replayer.play(simulation, args.ticks)
+    finally:
+        EVENTS.close()
+
+    colony = simulation.colony
+    print(f"Replayed {ticks_run} ticks in {elapsed:.2f}s ({ticks_run / elapsed if elapsed > 0 else float('inf'):.1f} ticks/s)")
+    print(f"Tick {simulation.tick}: Probes: {len(simulation.probes)}, Labs: {colony.research_labs}")
+    print(f"Colony: Min={colony.minerals}, Gas={colony.gases}, Energy={colony.energy}, Research={colony.research}")
+    if args.profile:
+        PROFILER.export(args.profile)
+        for name, stats in PROFILER.summary()["phases"].items():
+            print(f"{name:>17}: p50 {stats['p50_ms']:.3f} ms, p99 {stats['p99_ms']:.3f} ms, total {stats['total_ms'] / 1000:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+"""Runs the simulation across worker processes, one vertical strip of the world each.
+
+Every worker builds the same seeded galaxy, so stars never cross the pipe;
+only what changes does:
+
+* probes whose x leaves a worker's strip migrate to the strip they entered,
+* probes within the communication radius of a border are sent to the
+  neighbouring strip as read-only ghosts, so gossip still reaches across,
+* every amount mined is journalled and replayed on the other workers, so
+  all star replicas agree about what is left,
+* deliveries made to the colony from another strip are forwarded to the
+  worker that owns the colony, which also builds all new probes.
+
+The run is equivalent to a single-process one, not bit-identical: probes
+are updated in a different order, workers see each other's mining one tick
+late, and probes learn from ghosts as they were at the start of the
+communication phase.
+
+    python sharding.py --shards 4 --ticks 20000 --seed 1
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+from events import EVENTS, OFF
+from simulation import (
+    WORLD_WIDTH,
+    WORLD_HEIGHT,
+    NUM_STARS,
+    DEFAULT_CONFIG,
+    Colony,
+    MAX_CARGO,
+    Probe,
+    Simulation,
+    Star,
+)
+
+TARGET_NONE = 0
+TARGET_STAR = 1
+TARGET_COLONY = 2
+
+COLONY_STATS = ("minerals", "gases", "energy", "research", "research_labs", "probe_speed_researched")
+
+
+# --------------------------
+# Worker-Side Helpers
+# --------------------------
+class RemoteColony(Colony):
+    """Stand-in for the colony in workers that do not own it.
+
+    Probes there still navigate by its position and star index; anything
+    they deliver is held back and forwarded to the owning worker.
+    """
+
+    __slots__ = ("pending",)
+
+    def __init__(self, x, y, stars, star_index, config=DEFAULT_CONFIG):
+        super().__init__(x, y, stars, star_index, config=config)
+        self.pending = [0, 0, 0, 0]
+
+    def deposit(self, minerals, gases, energy, research=0):
+        self.pending[0] += minerals
+        self.pending[1] += gases
+        self.pending[2] += energy
+        self.pending[3] += research
+
+    def take_pending(self):
+        pending, self.pending = self.pending, [0, 0, 0, 0]
+        return pending
+
+
+class Ghost:
+    """Read-only copy of a probe in a neighbouring strip; only what `Probe.learn_from` reads."""
+
+    __slots__ = ("uid", "x", "y", "visited_log", "knowledge_epoch")
+
+    def __init__(self, uid):
+        self.uid = uid
+        self.x = self.y = 0.0
+        self.visited_log = []
+        self.knowledge_epoch = 0
+
+
+class ProbeCount:
+    """Passed to `Colony.update` in place of the probe list: appends go to the
+    worker's probes, but the length is the probe count of the whole world."""
+
+    def __init__(self, probes, total):
+        self.probes = probes
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def append(self, probe):
+        self.probes.append(probe)
+        self.total += 1
+
+
+class Shard:
+    """One worker's strip of the world: [x_min, x_max) across the full height."""
+
+    def __init__(self, index, shards, world_width, world_height, num_stars, seed, vectorised, config=None):
+        self.index = index
+        self.strip_width = world_width / shards
+        self.shards = shards
+        self.x_min = index * self.strip_width
+        self.x_max = (index + 1) * self.strip_width
+
+        self.simulation = Simulation(world_width, world_height, num_stars, vectorised=vectorised, seed=seed,
+                                     config=config)
+        self.communication_radius = self.simulation.config.communication_radius
+        self.stars = self.simulation.stars
+        self.star_ids = {star: star_id for star_id, star in enumerate(self.stars)}
+        self.star_index = self.simulation.colony.star_index
+        self.star_index.journal = []
+
+        colony = self.simulation.colony
+        self.owns_colony = self.strip_of(colony.x) == index
+        if not self.owns_colony:
+            self.simulation.colony = RemoteColony(colony.x, colony.y, self.stars, self.star_index, colony.config)
+            self.simulation.probes.clear()
+        self.colony = self.simulation.colony
+
+        self.uids = {probe: 0 for probe in self.simulation.probes}  # Probe -> uid; the starting probe is uid 0
+        self.by_uid = {uid: probe for probe, uid in self.uids.items()}
+        self.next_uid = 1  # Only the colony owner builds probes, so only it hands out uids
+        self.ghosts = {}  # uid -> Ghost, kept while out of range so cursors keyed by it stay valid
+        self.halo = []  # Ghosts in range this tick
+        self.sent = {}  # Neighbour shard -> {uid: (epoch, log length already sent)}
+
+    def strip_of(self, x):
+        return min(self.shards - 1, max(0, int(x // self.strip_width)))
+
+    # --- Inbound ---
+    def apply_mined(self, journal):
+        """Replays other workers' mining on the local star replicas."""
+        stars = self.stars
+        for star_id, resource, amount in journal:
+            star = stars[star_id]
+            left = star.resources[resource]
+            if left <= 0:
+                continue
+            left = max(0, left - amount)
+            star.resources[resource] = left
+            if left == 0:
+                self.star_index.discard(star, resource)
+
+    def receive_probe(self, packed):
+        (uid, x, y, speed, cargo, max_cargo, claim, target_kind, target_id, state, is_mining, visited_ids, epoch, cursors,
+         replication_cooldown, mining_rate) = packed
+        probe = Probe(x, y, self.stars, self.colony, speed=speed)
+        probe.cargo = list(cargo)
+        probe.max_cargo = MAX_CARGO if max_cargo == MAX_CARGO else max_cargo
+        if target_kind == TARGET_STAR:
+            probe.target = self.stars[target_id]
+            if claim is not None:
+                self.star_index.claim(probe, probe.target, list(claim))
+        elif target_kind == TARGET_COLONY:
+            probe.target = self.colony
+        probe.state = state
+        probe.is_mining = is_mining
+        probe.visited_log = [self.stars[star_id] for star_id in visited_ids]
+        probe.visited_stars = set(probe.visited_log)
+        probe.knowledge_epoch = epoch
+        probe.peer_cursors = {self.peer(peer_uid): cursor for peer_uid, cursor in cursors}
+        probe.replication_cooldown = replication_cooldown
+        probe.mining_rate = mining_rate
+        self.uids[probe] = uid
+        self.by_uid[uid] = probe
+        self.simulation.probes.append(probe)
+
+    def peer(self, uid):
+        """Resolves a uid from a migrated cursor to the local object that stands for that probe."""
+        probe = self.by_uid.get(uid)
+        if probe is not None:
+            return probe
+        ghost = self.ghosts.get(uid)
+        if ghost is None:
+            ghost = self.ghosts[uid] = Ghost(uid)
+        return ghost
+
+    def receive_halo(self, halos):
+        """Refreshes the ghosts neighbours sent this tick; the rest drop out of range."""
+        stars = self.stars
+        in_range = []
+        for halo in halos:
+            for uid, x, y, epoch, start, visited_ids in halo:
+                ghost = self.ghosts.get(uid)
+                if ghost is None:
+                    ghost = self.ghosts[uid] = Ghost(uid)
+                ghost.x = x
+                ghost.y = y
+                ghost.knowledge_epoch = epoch
+                if start == 0:
+                    ghost.visited_log = []
+                ghost.visited_log.extend(stars[star_id] for star_id in visited_ids)
+                in_range.append(ghost)
+        in_range_uids = {ghost.uid for ghost in in_range}
+        for ghost in self.halo:
+            if ghost.uid not in in_range_uids:
+                ghost.visited_log = []  # Resent in full if it comes back
+        self.halo = in_range
+
+    def communicate(self):
+        """The previous tick's communication phase, with ghosts standing in for probes across the border."""
+        grid = self.simulation.probe_grid
+        grid.clear()
+        for probe in self.simulation.probes:
+            grid.add_probe(probe)
+        for ghost in self.halo:
+            grid.add_probe(ghost)
+        for probe, other_probe in grid.nearby_pairs(self.communication_radius):
+            if type(probe) is Ghost:
+                if type(other_probe) is not Ghost:  # Ghost pairs are handled by the strip they live in
+                    other_probe.learn_from(probe)
+            elif type(other_probe) is Ghost:
+                probe.learn_from(other_probe)
+            else:
+                probe.share_with(other_probe)
+
+    # --- Outbound ---
+    def pack_probe(self, probe):
+        uids = self.uids
+        target = probe.target
+        if isinstance(target, Star):
+            target_kind, target_id = TARGET_STAR, self.star_ids[target]
+        elif isinstance(target, Colony):
+            target_kind, target_id = TARGET_COLONY, 0
+        else:
+            target_kind, target_id = TARGET_NONE, 0
+        cursors = []
+        for peer, cursor in probe.peer_cursors.items():
+            peer_uid = peer.uid if type(peer) is Ghost else uids.get(peer)
+            if peer_uid is not None:  # Cursors for probes that left long ago are dropped; they only cost a rescan
+                cursors.append((peer_uid, cursor))
+        star_ids = self.star_ids
+        uid = uids.pop(probe)
+        del self.by_uid[uid]
+        claim = tuple(probe.claim[1]) if probe.claim else None
+        self.star_index.release(probe)  # Claims are local to each worker's replica; the receiver books it again
+        return (
+            uid, probe.x, probe.y, probe.speed,
+            tuple(probe.cargo), tuple(probe.max_cargo), claim,
+            target_kind, target_id, probe.state, probe.is_mining,
+            [star_ids[star] for star in probe.visited_log], probe.knowledge_epoch, cursors,
+            probe.replication_cooldown, probe.mining_rate,
+        )
+
+    def emigrate(self):
+        """Packs up probes that moved out of this strip, keyed by the shard they moved into."""
+        migrants = {}
+        staying = []
+        for probe in self.simulation.probes:
+            if self.x_min <= probe.x < self.x_max:
+                staying.append(probe)
+            else:
+                migrants.setdefault(self.strip_of(probe.x), []).append(self.pack_probe(probe))
+        if migrants:
+            self.simulation.probes[:] = staying
+            self.simulation.engine = None  # The vector engine only tracks appends; rebuild it
+        return migrants
+
+    def build_halo(self):
+        """Ghost updates for the neighbours: probes within the communication radius of a border.
+
+        Each neighbour keeps its ghosts between ticks, so only the part of
+        a visited_log it has not been sent yet goes over the pipe.
+        """
+        star_ids = self.star_ids
+        radius = self.communication_radius
+        halos = {}
+        for neighbour, near_border in ((self.index - 1, lambda x: x < self.x_min + radius),
+                                       (self.index + 1, lambda x: x >= self.x_max - radius)):
+            if not 0 <= neighbour < self.shards:
+                continue
+            previous = self.sent.get(neighbour, {})
+            sent = {}
+            halo = []
+            for probe in self.simulation.probes:
+                if not near_border(probe.x):
+                    continue
+                uid = self.uids[probe]
+                epoch, start = previous.get(uid, (None, 0))
+                if epoch != probe.knowledge_epoch:
+                    start = 0
+                log = probe.visited_log
+                halo.append((uid, probe.x, probe.y, probe.knowledge_epoch, start,
+                             [star_ids[star] for star in log[start:]]))
+                sent[uid] = (probe.knowledge_epoch, len(log))
+            self.sent[neighbour] = sent
+            halos[neighbour] = halo
+        return halos
+
+    def step(self, inbound):
+        """Finishes the previous tick (migrants, ghosts, communication) and runs the next one up to its exchange."""
+        simulation = self.simulation
+        self.apply_mined(inbound["mined"])
+        if self.owns_colony:
+            self.colony.deposit(*inbound["deposits"])
+        for packed in inbound["migrants"]:
+            self.receive_probe(packed)
+        self.receive_halo(inbound["halos"])
+        if inbound["communicate"]:
+            self.communicate()
+
+        simulation.update_probes()
+        if self.owns_colony:
+            built = len(simulation.probes)
+            self.colony.update(ProbeCount(simulation.probes, inbound["probe_count"]))
+            for probe in simulation.probes[built:]:
+                self.uids[probe] = self.next_uid
+                self.by_uid[self.next_uid] = probe
+                self.next_uid += 1
+        simulation.sync_probes()  # Emigration, the halo and the next communication phase read positions
+
+        journal = self.star_index.journal
+        star_ids = self.star_ids
+        outbound = {
+            "mined": [(star_ids[star], resource, amount) for star, resource, amount in journal],
+            "deposits": [0, 0, 0, 0] if self.owns_colony else self.colony.take_pending(),
+            "migrants": self.emigrate(),
+            "halos": self.build_halo(),
+            "probes": len(simulation.probes),
+            "colony": {field: getattr(self.colony, field) for field in COLONY_STATS} if self.owns_colony else None,
+        }
+        journal.clear()
+        return outbound
+
+
+def _shard_main(connection, index, shards, world_width, world_height, num_stars, seed, vectorised, config):
+    EVENTS.level = OFF  # Worker events would only fill a ring buffer nobody reads
+    shard = Shard(index, shards, world_width, world_height, num_stars, seed, vectorised, config)
+    connection.send(shard.owns_colony)
+    while True:
+        inbound = connection.recv()
+        if inbound is None:
+            break
+        connection.send(shard.step(inbound))
+    connection.close()
+
+
+# --------------------------
+# Sharded Simulation Class
+# --------------------------
+class ShardedSimulation:
+    """Drives one worker process per strip and routes what crosses between them.
+
+    `step()` is one round trip to every worker. The communication phase of
+    a tick runs at the start of the next round trip, once migrants and
+    ghosts have been delivered, so it trails `tick` by one.
+    """
+
+    def __init__(self, world_width=WORLD_WIDTH, world_height=WORLD_HEIGHT, num_stars=NUM_STARS, shards=None,
+                 seed=None, vectorised=False, config=None):
+        if shards is None:
+            shards = os.cpu_count() or 1
+        radius = (config or DEFAULT_CONFIG).communication_radius
+        if world_width / shards < radius:
+            raise ValueError(f"{shards} strips of a {world_width} wide world are narrower than the "
+                             f"communication radius {radius}; use fewer shards")
+        if seed is None:
+            seed = random.randrange(2 ** 32)  # Every worker must build the same galaxy
+        self.seed = seed
+        self.shards = shards
+        self.tick = 0
+        self.probe_count = 1
+        self.colony = dict.fromkeys(COLONY_STATS, 0)
+
+        self.connections = []
+        self.processes = []
+        for index in range(shards):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_shard_main, name=f"shard-{index}", daemon=True,
+                args=(child, index, shards, world_width, world_height, num_stars, seed, vectorised, config),
+            )
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        owners = [connection.recv() for connection in self.connections]
+        self.owner = owners.index(True)
+        self.inbound = [self._empty_inbound() for _ in range(shards)]
+
+    def _empty_inbound(self):
+        return {"mined": [], "deposits": [0, 0, 0, 0], "migrants": [], "halos": [],
+                "communicate": self.tick > 0, "probe_count": self.probe_count}
+
+    def step(self):
+        """Advances every strip by one tick."""
+        for connection, inbound in zip(self.connections, self.inbound):
+            connection.send(inbound)
+        outbound = [connection.recv() for connection in self.connections]
+        self.tick += 1
+
+        self.probe_count = sum(out["probes"] for out in outbound)
+        self.colony = outbound[self.owner]["colony"]
+        self.inbound = inbound = [self._empty_inbound() for _ in range(self.shards)]
+        for source, out in enumerate(outbound):
+            if out["mined"]:
+                for target, target_inbound in enumerate(inbound):
+                    if target != source:
+                        target_inbound["mined"].extend(out["mined"])
+            deposits = inbound[self.owner]["deposits"]
+            for resource, amount in enumerate(out["deposits"]):
+                deposits[resource] += amount
+            for target, packed in out["migrants"].items():
+                inbound[target]["migrants"].extend(packed)
+            for target, halo in out["halos"].items():
+                inbound[target]["halos"].append(halo)
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for process in self.processes:
+            process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the colony simulation across worker processes.")
+    parser.add_argument("--ticks", type=int, required=True)
+    parser.add_argument("--shards", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--stars", type=int, default=NUM_STARS)
+    parser.add_argument("--world-width", type=int, default=WORLD_WIDTH)
+    parser.add_argument("--world-height", type=int, default=WORLD_HEIGHT)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--vectorised", action="store_true", help="Move each strip's probes with the NumPy engine")
+    args = parser.parse_args()
+
+    with ShardedSimulation(args.world_width, args.world_height, args.stars, args.shards, args.seed,
+                           args.vectorised) as simulation:
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            simulation.step()
+        elapsed = time.perf_counter() - start
+    colony = simulation.colony
+    print(f"Ran {args.ticks} ticks on {simulation.shards} shards in {elapsed:.2f}s "
+          f"({args.ticks / elapsed if elapsed > 0 else float('inf'):.1f} ticks/s)")
+    print(f"Probes: {simulation.probe_count}, Labs: {colony['research_labs']}")
+    print(f"Colony: Min={colony['minerals']}, Gas={colony['gases']}, Energy={colony['energy']}, "
+          f"Research={colony['research']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Runs the simulation on its own thread, decoupled from the display frame rate.
+
+The worker steps at a fixed rate (a multiple of BASE_TICK_RATE, or as fast
+as it can) and publishes read-only Snapshot objects. It keeps the
+previous and the latest one, so the viewer can interpolate probe
+positions between them and never reads an object the worker is changing:
+
+    worker = SimulationThread(simulation, rate=1)
+    worker.start()
+    previous, latest = worker.snapshots()
+    ...
+    worker.stop()
+
+Both threads share the GIL, so a slow frame still takes time away from
+the simulation; what it no longer does is set the tick rate.
+"""
+import collections
+import threading
+import time
+
+import numpy as np
+
+from star_index import RESOURCES
+
+BASE_TICK_RATE = 60  # Ticks per second at 1x
+SIM_RATES = (1, 10, None)  # Selectable rates; None runs as fast as possible
+PUBLISH_INTERVAL = 1 / 120  # Publish at most this often; building a snapshot costs a pass over the probes
+MAX_CATCH_UP = 0.25  # Seconds of missed ticks made up after a stall before the schedule resets
+PROBE_INDEX_CELL_SIZE = 100  # World units per cell of a snapshot's probe index
+
+
+# --------------------------
+# Snapshot Class
+# --------------------------
+class Snapshot:
+    """Everything the viewer draws for one tick. Arrays are read-only and never change once published."""
+
+    __slots__ = (
+        "tick", "time", "x", "y", "target_x", "target_y", "has_target", "state", "cargo", "speed", "colony_resources",
+        "research_labs", "probe_speed_researched", "_index_keys", "_index_order", "_drift",
+    )
+
+    def __init__(self, simulation, published_at):
+        simulation.sync_probes()
+        probes = simulation.probes
+        count = len(probes)
+        self.tick = simulation.tick
+        self.time = published_at
+        self.x = _frozen(np.fromiter((probe.x for probe in probes), dtype=np.float64, count=count))
+        self.y = _frozen(np.fromiter((probe.y for probe in probes), dtype=np.float64, count=count))
+        targets = [probe.target for probe in probes]
+        self.has_target = _frozen(np.fromiter((target is not None for target in targets), dtype=np.bool_, count=count))
+        self.target_x = _frozen(np.fromiter((target.x if target is not None else 0.0 for target in targets),
+                                            dtype=np.float64, count=count))
+        self.target_y = _frozen(np.fromiter((target.y if target is not None else 0.0 for target in targets),
+                                            dtype=np.float64, count=count))
+        # For tooltips; copied like the rest, so the viewer never reads a probe the worker is changing
+        self.state = tuple(probe.state for probe in probes)
+        self.cargo = _frozen(np.array([probe.cargo for probe in probes], dtype=np.int64).reshape(count, len(RESOURCES)))
+        self.speed = tuple(probe.speed for probe in probes)
+        colony = simulation.colony
+        self.colony_resources = (colony.minerals, colony.gases, colony.energy, colony.research)
+        self.research_labs = colony.research_labs
+        self.probe_speed_researched = colony.probe_speed_researched
+        # Built by the viewer on first use; nothing else reads them
+        self._index_keys = self._index_order = None
+        self._drift = (None, 0.0)
+
+    def __len__(self):
+        return len(self.x)
+
+    def positions(self, previous, now):
+        """Probe x and y arrays interpolated from `previous` towards this snapshot for wall time `now`.
+
+        The view runs one publish interval behind the simulation, which is
+        what lets it move smoothly between ticks. Probes built since
+        `previous` are drawn where this snapshot has them.
+        """
+        span = self.time - previous.time
+        if span <= 0:
+            return self.x, self.y
+        alpha = min(1.0, max(0.0, (now - self.time) / span))
+        count = len(previous)
+        x = self.x.copy()
+        y = self.y.copy()
+        x[:count] = previous.x + (self.x[:count] - previous.x) * alpha
+        y[:count] = previous.y + (self.y[:count] - previous.y) * alpha
+        return x, y
+
+
+    def drift(self, previous):
+        """How far any probe moved since `previous`, i.e. how far an interpolated position can be from ours."""
+        if self._drift[0] is not previous:
+            count = len(previous)
+            moved = np.hypot(self.x[:count] - previous.x, self.y[:count] - previous.y)
+            self._drift = (previous, float(moved.max()) if count else 0.0)
+        return self._drift[1]
+
+    def probes_in(self, min_x, min_y, max_x, max_y):
+        """Sorted indices of the probes inside the world box, through a grid index built on first use.
+
+        The index sorts probes by cell once per snapshot, so a query costs a
+        binary search per column of cells it spans, not a pass over every probe.
+        """
+        if self._index_keys is None:
+            cell_xs = (self.x // PROBE_INDEX_CELL_SIZE).astype(np.int64)
+            cell_ys = (self.y // PROBE_INDEX_CELL_SIZE).astype(np.int64)
+            keys = (cell_xs << 32) + cell_ys  # Positions are never negative, so columns stay contiguous
+            self._index_order = np.argsort(keys, kind="stable")
+            self._index_keys = keys[self._index_order]
+        keys = self._index_keys
+        first_y = max(int(min_y // PROBE_INDEX_CELL_SIZE), 0)
+        last_y = int(max_y // PROBE_INDEX_CELL_SIZE)
+        found = []
+        for cell_x in range(max(int(min_x // PROBE_INDEX_CELL_SIZE), 0), int(max_x // PROBE_INDEX_CELL_SIZE) + 1):
+            low = np.searchsorted(keys, (cell_x << 32) + first_y, side="left")
+            high = np.searchsorted(keys, (cell_x << 32) + last_y, side="right")
+            if low < high:
+                found.append(self._index_order[low:high])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.sort(np.concatenate(found))
+        xs = self.x[candidates]
+        ys = self.y[candidates]
+        return candidates[(xs >= min_x) & (xs <= max_x) & (ys >= min_y) & (ys <= max_y)]
+
+
+def _frozen(array):
+    array.flags.writeable = False
+    return array
+
+
+# --------------------------
+# Simulation Thread Class
+# --------------------------
+class SimulationThread(threading.Thread):
+    """Steps a simulation at `rate` times BASE_TICK_RATE (None: unthrottled) and publishes snapshots.
+
+    `on_tick(simulation)` runs on this thread after every step, e.g. to
+    write keyframes. Nothing outside the thread may touch the simulation
+    until `stop()` has returned.
+    """
+
+    def __init__(self, simulation, rate=1, on_tick=None):
+        super().__init__(name="simulation", daemon=True)
+        self.simulation = simulation
+        self.rate = rate
+        self.on_tick = on_tick
+        self.ticks_per_second = 0.0  # Measured over the last second or so, for the HUD
+        # Stars that ran out of something, for the viewer to pop and redraw; deque ends are thread-safe
+        self.depleted = collections.deque()
+        simulation.colony.star_index.listeners.append(self.depleted.append)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._rate_changed = threading.Event()
+        now = time.perf_counter()
+        self._previous = self._latest = Snapshot(simulation, now)
+
+    def snapshots(self):
+        """The (previous, latest) pair of published snapshots."""
+        with self._lock:
+            return self._previous, self._latest
+
+    def set_rate(self, rate):
+        self.rate = rate
+        self._rate_changed.set()
+
+    def stop(self):
+        self._stopping.set()
+        if self.is_alive():
+            self.join()
+
+    def _publish(self, now):
+        snapshot = Snapshot(self.simulation, now)
+        with self._lock:
+            self._previous, self._latest = self._latest, snapshot
+
+    def run(self):
+        simulation = self.simulation
+        clock = time.perf_counter
+        next_tick = clock()
+        last_publish = 0.0
+        rate_start, rate_ticks = clock(), 0
+        while not self._stopping.is_set():
+            rate = self.rate
+            now = clock()
+            if self._rate_changed.is_set():
+                self._rate_changed.clear()
+                next_tick = now
+            if rate is not None:
+                if now < next_tick:
+                    self._stopping.wait(min(next_tick - now, 0.05))
+                    continue
+                next_tick = max(next_tick + 1 / (BASE_TICK_RATE * rate), now - MAX_CATCH_UP)
+
+            simulation.step()
+            if self.on_tick is not None:
+                self.on_tick(simulation)
+            rate_ticks += 1
+
+            now = clock()
+            if now - last_publish >= PUBLISH_INTERVAL:
+                self._publish(now)
+                last_publish = now
+            if now - rate_start >= 1.0:
+                self.ticks_per_second = rate_ticks / (now - rate_start)
+                rate_start, rate_ticks = now, 0
+        self._publish(clock())  # The final state, so the last frame matches what stop() leaves behind
@@ -0,0 +1,841 @@
+import random
+import math
+from itertools import filterfalse
+
+from events import (
+    DEBUG,
+    INFO,
+    EVENTS,
+    AnomalyDiscovered,
+    Delivered,
+    LabBuilt,
+    Mined,
+    MiningStopped,
+    StarDepleted,
+    TargetAssigned,
+    UpgradeResearched,
+)
+from galaxy import place_stars
+from profiler import PROFILER
+from stats import STATS
+from star_index import RESOURCE_TYPES, RESOURCES, RESEARCH, StarIndex
+
+# --------------------------
+# Constants & Configurations
+# --------------------------
+WORLD_WIDTH = 4000
+WORLD_HEIGHT = 4000
+NUM_STARS = 2000
+MIN_STAR_DISTANCE = 15
+STAR_RESOURCE_RANGE = (50, 200)  # Keep this, but it applies to each resource type
+PROBE_REPLICATION_COST = {"minerals": 70, "gases": 70, "energy": 0}  # Cost in each resource
+MAX_PROBES = 1000
+COMMUNICATION_RADIUS = 200  # Introduce a communication radius
+REPLICATION_COOLDOWN_TIME = 100  # Cooldown in frames
+PROBE_CONSTRUCTION_THRESHOLD = 200  # Colony resource threshold to trigger probe construction
+PROBE_SPEED_UPGRADE_RESEARCH_COST = 150
+PROBE_SPEED_UPGRADE_AMOUNT = 1
+RESEARCH_LAB_BUILD_COST = {"minerals": 800, "gases": 400}  # Increased build cost significantly!
+RESEARCH_LAB_RESEARCH_RATE = 1
+RESEARCH_LAB_BUILD_THRESHOLD = 600  # Colony resource threshold to trigger lab construction
+MAX_CARGO = (200, 200, 200, 100)  # Per resource ID; shared by every probe rather than copied
+
+
+# --------------------------
+# Run Configuration Class
+# --------------------------
+class SimConfig:
+    """The tunable rules of one run. Defaults are the constants above, so a run only names what it changes:
+
+        Simulation(config=SimConfig(num_stars=5000, communication_radius=150))
+    """
+
+    __slots__ = (
+        "world_width", "world_height", "num_stars", "max_probes", "communication_radius",
+        "replication_cooldown_time", "probe_construction_threshold", "probe_replication_cost",
+        "probe_speed_upgrade_research_cost", "probe_speed_upgrade_amount", "research_lab_build_cost",
+        "research_lab_research_rate", "research_lab_build_threshold",
+    )
+
+    def __init__(self, world_width=WORLD_WIDTH, world_height=WORLD_HEIGHT, num_stars=NUM_STARS, max_probes=MAX_PROBES,
+                 communication_radius=COMMUNICATION_RADIUS, replication_cooldown_time=REPLICATION_COOLDOWN_TIME,
+                 probe_construction_threshold=PROBE_CONSTRUCTION_THRESHOLD, probe_replication_cost=None,
+                 probe_speed_upgrade_research_cost=PROBE_SPEED_UPGRADE_RESEARCH_COST,
+                 probe_speed_upgrade_amount=PROBE_SPEED_UPGRADE_AMOUNT, research_lab_build_cost=None,
+                 research_lab_research_rate=RESEARCH_LAB_RESEARCH_RATE,
+                 research_lab_build_threshold=RESEARCH_LAB_BUILD_THRESHOLD):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.num_stars = num_stars
+        self.max_probes = max_probes
+        self.communication_radius = communication_radius
+        self.replication_cooldown_time = replication_cooldown_time
+        self.probe_construction_threshold = probe_construction_threshold
+        # Copied, so changing one run's costs never leaks into the module defaults or another run
+        self.probe_replication_cost = dict(PROBE_REPLICATION_COST if probe_replication_cost is None
+                                           else probe_replication_cost)
+        self.probe_speed_upgrade_research_cost = probe_speed_upgrade_research_cost
+        self.probe_speed_upgrade_amount = probe_speed_upgrade_amount
+        self.research_lab_build_cost = dict(RESEARCH_LAB_BUILD_COST if research_lab_build_cost is None
+                                            else research_lab_build_cost)
+        self.research_lab_research_rate = research_lab_research_rate
+        self.research_lab_build_threshold = research_lab_build_threshold
+
+    def to_dict(self):
+        """Plain JSON-serialisable form, for checkpoints, recordings and sweep results."""
+        return {name: dict(value) if isinstance(value, dict) else value
+                for name, value in ((name, getattr(self, name)) for name in self.__slots__)}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**values)
+
+    def replace(self, **changes):
+        """A copy with `changes` applied; unknown names raise TypeError like the constructor."""
+        values = self.to_dict()
+        values.update(changes)
+        return SimConfig(**values)
+
+    def __eq__(self, other):
+        return isinstance(other, SimConfig) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        changed = {name: value for name, value in self.to_dict().items() if value != getattr(DEFAULT_CONFIG, name)}
+        return f"SimConfig({', '.join(f'{name}={value!r}' for name, value in changed.items())})"
+
+
+DEFAULT_CONFIG = SimConfig()  # Shared by colonies built without a config; never modified
+
+
+# --------------------------
+# Star Class (Modified)
+# --------------------------
+class Star:
+    __slots__ = ("x", "y", "size_mod", "color", "resources", "visits", "distance_to_center", "index", "__weakref__")
+
+    def __init__(self, x, y, size_mod=1.0, rng=random):
+        self.x = x
+        self.y = y
+        self.size_mod = size_mod
+        # Generate random color and use RGB for resources
+        self.color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+        low, high = STAR_RESOURCE_RANGE
+        self.resources = [  # Indexed by resource ID: minerals, gases, energy, research
+            int(self.color[0] / 255 * (high - low) + low),
+            int(self.color[1] / 255 * (high - low) + low),
+            int(self.color[2] / 255 * (high - low) + low),
+            rng.randint(20, 100),
+        ]
+        self.visits = 0  # Initialize visits to track how many times this star has been mined
+        self.distance_to_center = 0  # Placeholder for distance to center
+        self.index = None  # StarIndex this star is registered with, if any
+
+    def total_resources(self):
+        resources = self.resources
+        return resources[0] + resources[1] + resources[2] + resources[3]
+
+    def mine_resource(self, resource, amount):
+        """Takes up to `amount` of the resource with ID `resource`; returns how much was taken."""
+        resources = self.resources
+        mined = min(amount, resources[resource])
+        if mined > 0:
+            resources[resource] -= mined
+            if self.index is not None:
+                self.index.mined(self, resource, mined)  # Keeps the star index in step with depletion
+            if STATS.enabled:
+                STATS.mined(self, resource, mined)
+        return mined
+
+# --------------------------
+# Colony Class
+# --------------------------
+class Colony:
+    __slots__ = (
+        "x", "y", "minerals", "gases", "energy", "research", "stars", "star_index", "probe_construction_timer",
+        "probe_speed_researched", "research_labs", "lab_construction_timer", "rng", "config", "delivered",
+    )
+
+    def __init__(self, x, y, stars, star_index=None, rng=random, config=DEFAULT_CONFIG):  # Added stars parameter
+        self.x = x
+        self.y = y
+        self.minerals = 0
+        self.gases = 0
+        self.energy = 0
+        self.research = 0
+        self.stars = stars  # Store stars for probe construction
+        self.star_index = star_index if star_index is not None else StarIndex(stars)  # Shared by all probes
+        self.probe_construction_timer = 0  # Timer to control probe construction frequency
+        self.probe_speed_researched = False  # Track if speed upgrade is researched
+        self.research_labs = 0
+        self.lab_construction_timer = 0  # Timer to control lab construction frequency
+        self.rng = rng  # Anomaly bonuses; Simulation passes a stream seeded from the run's seed
+        self.config = config  # Costs, thresholds and cooldowns of this run
+        self.delivered = [0, 0, 0, 0]  # Everything ever deposited, by resource ID, before anything was spent
+
+    def deposit(self, minerals, gases, energy, research=0):
+        self.minerals += minerals
+        self.gases += gases
+        self.energy += energy
+        self.research += research
+        delivered = self.delivered
+        delivered[0] += minerals
+        delivered[1] += gases
+        delivered[2] += energy
+        delivered[3] += research
+        if STATS.enabled:
+            STATS.delivered(minerals, gases, energy, research)
+
+    def construct_probe(self):
+        cost = self.config.probe_replication_cost
+        if (self.minerals >= cost["minerals"] and
+                self.gases >= cost["gases"]):  # Energy is free for probes
+
+            self.minerals -= cost["minerals"]
+            self.gases -= cost["gases"]
+
+            probe_speed = 2  # Base speed
+            if self.probe_speed_researched:  # Apply speed upgrade if researched
+                probe_speed += self.config.probe_speed_upgrade_amount
+
+            new_probe = Probe(self.x, self.y, self.stars, self, speed=probe_speed)  # Colony is now self, pass speed
+            if STATS.enabled:
+                STATS.probe_built(new_probe)  # Counted as idle, before its first target moves it on
+            new_probe.set_target(new_probe.find_star(), "traveling_to_star")
+            return new_probe
+        return None
+
+    def research_probe_speed_upgrade(self):
+        if not self.probe_speed_researched:  # Only research if not already done
+            research_cost = self.config.probe_speed_upgrade_research_cost
+            if self.research >= research_cost:
+                self.research -= research_cost
+                self.probe_speed_researched = True  # Mark upgrade as researched
+                if EVENTS.level <= INFO:
+                    EVENTS.emit(UpgradeResearched("Probe Speed"))
+                return True  # Research successful
+        return False  # Research failed or already done
+
+    def build_research_lab(self):
+        cost = self.config.research_lab_build_cost
+        if (self.minerals >= cost["minerals"] and
+            self.gases >= cost["gases"]):
+            self.minerals -= cost["minerals"]
+            self.gases -= cost["gases"]
+            self.research_labs += 1
+            if EVENTS.level <= INFO:
+                EVENTS.emit(LabBuilt(self.research_labs))
+            return True
+        return False
+
+    def update(self, probes):  # Pass probes list to colony update
+        config = self.config
+        if not self.probe_speed_researched:  # Try to research speed upgrade first if not done
+            self.research_probe_speed_upgrade()  # Colony attempts to research every frame it has resources
+
+        if len(probes) < config.max_probes:  # Check probe limit
+            if (self.minerals > config.probe_construction_threshold and
+                    self.gases > config.probe_construction_threshold and
+                    self.probe_construction_timer <= 0):  # Check timer
+
+                new_probe = self.construct_probe()
+                if new_probe:
+                    probes.append(new_probe)  # Colony adds probe to the list
+                    self.probe_construction_timer = config.replication_cooldown_time  # Reset timer
+
+        if self.probe_construction_timer > 0:
+            self.probe_construction_timer -= 1
+
+        self.research += self.research_labs * config.research_lab_research_rate
+
+        # Automated Research Lab Construction Logic:
+        if self.lab_construction_timer <= 0:  # Check lab construction timer
+            lab_cost = config.research_lab_build_cost
+            if (self.minerals > lab_cost["minerals"] + config.research_lab_build_threshold and  # Check resource thresholds
+                self.gases > lab_cost["gases"] + config.research_lab_build_threshold):  # Added threshold buffer
+
+                if self.build_research_lab():  # Attempt to build lab
+                    self.lab_construction_timer = config.replication_cooldown_time * 2  # Longer cooldown for labs
+
+        if self.lab_construction_timer > 0:
+            self.lab_construction_timer -= 1
+
+# --------------------------
+# Probe Class
+# --------------------------
+class Probe:
+    __slots__ = (
+        "x", "y", "speed", "cargo", "target", "state", "stars", "colony", "is_mining", "max_cargo", "visited_stars",
+        "visited_log", "knowledge_epoch", "peer_cursors", "replication_cooldown", "mining_rate", "claim",
+    )
+
+    def __init__(self, x, y, stars, colony, speed=2):
+        self.x = x
+        self.y = y
+        self.speed = speed
+        self.cargo = [0, 0, 0, 0]  # Indexed by resource ID
+        self.target = None
+        self.state = "idle"
+        self.stars = stars
+        self.colony = colony
+        self.is_mining = False  # Keep track if probe is actively mining
+        self.max_cargo = MAX_CARGO
+        self.visited_stars = set()
+        self.visited_log = []  # Visited stars in the order they were learned, for delta gossip
+        self.knowledge_epoch = 0  # Bumped whenever visited_stars is reset
+        self.peer_cursors = {}  # Peer probe -> (peer epoch, how much of its visited_log we have seen)
+        self.replication_cooldown = 0
+        self.mining_rate = 1  # Introduce a mining rate, adjust as needed
+        self.claim = None  # (star, per-resource mining rates) booked in the star index, if any
+
+    def set_target(self, target, state):
+        index = self.colony.star_index
+        index.release(self)
+        if STATS.enabled:
+            STATS.state_changed(self.state, state)
+            if isinstance(target, Star):
+                STATS.target_assigned(target)
+        self.target = target
+        self.state = state
+        if isinstance(target, Star):  # Book the draw this trip will put on the star
+            research_trip = state == "traveling_to_star_for_research"
+            rates = [0, 0, 0, 0]
+            for resource in self.needs_resources():
+                if (resource == RESEARCH) == research_trip:
+                    rates[resource] = self.mining_rate
+            index.claim(self, target, rates)
+        if EVENTS.level <= DEBUG:
+            if isinstance(target, Star):
+                EVENTS.emit(TargetAssigned(self.x, self.y, "star", target.x, target.y, state))
+            elif isinstance(target, Colony):
+                EVENTS.emit(TargetAssigned(self.x, self.y, "colony", target.x, target.y, state))
+
+    def find_star(self, resource=None):
+        """Finds the nearest unvisited star with the resource ID `resource`, or with anything the probe needs."""
+        if PROFILER.enabled:
+            PROFILER.count("find_star")
+
+        if resource is None:
+            needed_resources = self.needs_resources()
+            if needed_resources:
+                resources = [needed for needed in needed_resources if needed != RESEARCH]
+            else:  # If no specific need, consider any star with resources
+                resources = RESOURCES
+        else:  # Specific resource type requested
+            resources = (resource,)
+
+        nearest_star = None
+        if resources:
+            index = self.colony.star_index
+            # Prefer stars that will still have something when we arrive; fall back to any star
+            nearest_star = (index.nearest(self.x, self.y, resources, self.visited_stars, self.speed) or
+                            index.nearest(self.x, self.y, resources, self.visited_stars))
+
+        if nearest_star and nearest_star not in self.visited_stars:  # Check again before adding
+            self.visit(nearest_star)  # Only add if we are going to use it
+
+        return nearest_star
+
+    def needs_resources(self):
+        """Resource IDs the cargo still has room for, in ID order."""
+        cargo = self.cargo
+        max_cargo = self.max_cargo
+        return [resource for resource in RESOURCES if cargo[resource] < max_cargo[resource]]
+
+    def find_star_with_resource(self, resource):
+        # Stars are sorted by distance to center, where the colony sits, so the
+        # first match in that order is the one nearest the colony.
+        star = self.colony.star_index.nearest(self.colony.x, self.colony.y, (resource,), self.visited_stars)
+        if star:
+            self.visit(star)
+        return star
+
+    def visit(self, star):
+        """Marks a star as visited so this probe and the probes it talks to skip it."""
+        self.visited_stars.add(star)
+        self.visited_log.append(star)
+
+    def update(self):
+        if self.replication_cooldown > 0:
+            self.replication_cooldown -= 1
+
+        if self.target:
+            if self.move():
+                self.arrive()
+        else:  # Probe has no target, find a new one
+            self.choose_target()
+
+    def move(self):
+        """Moves one step towards the target. Returns True once the target is within reach."""
+        # sqrt rather than hypot: NumPy's hypot rounds differently, and the vector engine must agree bit for bit
+        dx = self.target.x - self.x
+        dy = self.target.y - self.y
+        distance = math.sqrt(dx * dx + dy * dy)
+
+        if distance > self.speed:  # Still move towards target
+            dx, dy = dx / distance, dy / distance
+            self.x += dx * self.speed
+            self.y += dy * self.speed
+            dx = self.target.x - self.x
+            dy = self.target.y - self.y
+            distance = math.sqrt(dx * dx + dy * dy)
+
+        return distance <= self.speed
+
+    def arrive(self):
+        """Mines, delivers or explores once the probe has reached its target, as an arrival stage of one."""
+        resolve_arrivals((self,))
+
+    def resource_to_mine(self, star):
+        """The resource ID this probe would take from `star`: research on a research trip, else the first needed one it has."""
+        if self.state == "traveling_to_star_for_research":
+            return RESEARCH
+        cargo = self.cargo
+        max_cargo = self.max_cargo
+        available = star.resources
+        for resource in RESOURCES:  # Needed resources in resource ID order
+            if resource != RESEARCH and cargo[resource] < max_cargo[resource] and available[resource] > 0:
+                return resource
+        return None
+
+    def choose_target(self):
+        """Picks a new star for an idle probe."""
+        needed_resources = self.needs_resources()
+        if needed_resources and RESEARCH not in needed_resources:
+            for resource in needed_resources:
+                star = self.find_star(resource)
+                if star:
+                    self.set_target(star, "traveling_to_star")
+                    return
+
+        if self.cargo[RESEARCH] < self.max_cargo[RESEARCH]:
+            research_star = self.find_star(RESEARCH)
+            if research_star:
+                self.set_target(research_star, "traveling_to_star_for_research")
+                return
+
+        any_star = self.find_star()
+        if any_star:
+            self.set_target(any_star, "traveling_to_star")
+            return
+
+    def deposit(self, minerals, gases, energy, research):
+        if isinstance(self.target, Colony):
+            self.target.deposit(minerals, gases, energy, research)
+
+    def forget_visited_stars(self):
+        self.visited_stars = set()
+        self.visited_log = []
+        self.knowledge_epoch += 1
+        self.peer_cursors.clear()  # Relearn everything our neighbours know
+
+    def share_with(self, other_probe):
+        """Exchanges visited stars with a probe in communication range, in both directions."""
+        self.learn_from(other_probe)
+        other_probe.learn_from(self)
+
+    def learn_from(self, other_probe):
+        """Takes only the stars other_probe has learned since we last heard from it."""
+        epoch, seen = self.peer_cursors.get(other_probe, (None, 0))
+        if epoch != other_probe.knowledge_epoch:  # It forgot everything since; start over
+            seen = 0
+        log = other_probe.visited_log
+        if seen < len(log):
+            fresh = list(filterfalse(self.visited_stars.__contains__, log[seen:]))
+            self.visited_stars.update(fresh)
+            self.visited_log.extend(fresh)
+        self.peer_cursors[other_probe] = (other_probe.knowledge_epoch, len(log))
+
+    def is_hovered(self, mouse_x, mouse_y, zoom_level, offset_x, offset_y):
+        radius = 5 * zoom_level
+        draw_x = int((self.x - offset_x) * zoom_level)
+        draw_y = int((self.y - offset_y) * zoom_level)
+        return (draw_x - radius <= mouse_x <= draw_x + radius) and (draw_y - radius <= mouse_y <= draw_y + radius)
+
+
+class ExplorationTarget:
+    __slots__ = ("x", "y", "colony")
+
+    def __init__(self, x, y, colony):  # Needs colony
+        self.x = x
+        self.y = y
+        self.colony = colony  # Store the colony
+
+# --------------------------
+# Arrival Stage
+# --------------------------
+def resolve_arrivals(probes):
+    """Settles every probe that reached its target this tick in one pass.
+
+    Each probe at a star asks for what it would mine there alone, and the
+    requests on one resource of one star are settled together: in full when
+    the star has enough, split by `split_fairly` when it does not, so no
+    probe gets more for being earlier in the list. Each star is drawn from
+    once per resource and the colony takes every delivery in one deposit.
+    Probes that are done with their star pick the next one afterwards, in
+    list order, once every star's resources are final.
+    """
+    requests = {}  # (star, resource) -> [(probe, amount asked for)]
+    mining = {}  # Probe -> the star it asked
+    leaving = {}  # Probe -> state to set off in, for probes done with their star
+    delivered = [0, 0, 0, 0]
+    colony = None
+    for probe in probes:
+        target = probe.target
+        if isinstance(target, Star):
+            star = target
+            if star.total_resources() <= 0:
+                if EVENTS.level <= INFO:
+                    EVENTS.emit(StarDepleted(star.x, star.y))
+                leaving[probe] = "traveling_to_star"
+                continue
+            resource = probe.resource_to_mine(star)
+            if resource is None:  # Nothing here the probe needs
+                if EVENTS.level <= DEBUG:
+                    EVENTS.emit(MiningStopped(star.x, star.y, None, 0))
+                leaving[probe] = "traveling_to_star"
+                continue
+            amount = min(probe.mining_rate, probe.max_cargo[resource] - probe.cargo[resource], star.resources[resource])
+            if amount > 0:
+                requests.setdefault((star, resource), []).append((probe, amount))
+                mining[probe] = star
+                continue
+            if EVENTS.level <= DEBUG:
+                EVENTS.emit(MiningStopped(star.x, star.y, RESOURCE_TYPES[resource], star.resources[resource]))
+            if resource == RESEARCH and probe.cargo[RESEARCH] == probe.max_cargo[RESEARCH]:
+                leaving[probe] = "returning_to_colony"  # Full on research
+            else:
+                leaving[probe] = "traveling_to_star"
+
+        elif isinstance(target, Colony):
+            colony = target
+            cargo = probe.cargo
+            for resource in RESOURCES:
+                delivered[resource] += cargo[resource]
+            if EVENTS.level <= INFO:
+                EVENTS.emit(Delivered(dict(zip(RESOURCE_TYPES, cargo))))
+            cargo[0] = cargo[1] = cargo[2] = cargo[3] = 0  # Emptied in place
+            if STATS.enabled:
+                STATS.state_changed(probe.state, "idle")
+            probe.target = None
+            probe.state = "idle"
+            probe.is_mining = False
+            probe.forget_visited_stars()
+
+        elif isinstance(target, ExplorationTarget):
+            bonus = target.colony.rng.randint(20, 50)
+            target.colony.deposit(bonus, bonus, bonus)
+            if EVENTS.level <= INFO:
+                EVENTS.emit(AnomalyDiscovered(bonus))
+            if STATS.enabled:
+                STATS.bonus(bonus)
+                STATS.state_changed(probe.state, "idle")
+            probe.target = None
+            probe.state = "idle"
+            probe.is_mining = False
+
+    if colony is not None:
+        colony.deposit(delivered[0], delivered[1], delivered[2], delivered[3])
+
+    emptied = set()
+    for (star, resource), asked in requests.items():
+        if len(asked) == 1:  # The usual case: a star to itself, and the amount already fits
+            amounts = (asked[0][1],)
+        else:
+            amounts = [amount for _, amount in asked]
+            if sum(amounts) > star.resources[resource]:
+                amounts = split_fairly(asked, star.resources[resource])
+        star.mine_resource(resource, sum(amounts))
+        for (probe, _), amount in zip(asked, amounts):
+            if amount:
+                probe.cargo[resource] += amount
+                if EVENTS.level <= DEBUG:
+                    EVENTS.emit(Mined(RESOURCE_TYPES[resource], amount, dict(zip(RESOURCE_TYPES, probe.cargo))))
+        if star not in emptied and star.total_resources() <= 0:
+            emptied.add(star)
+            if EVENTS.level <= INFO:
+                EVENTS.emit(StarDepleted(star.x, star.y))
+
+    # A probe that got nothing stays and asks again next tick, unless the star is empty
+    for probe in probes:
+        state = leaving.get(probe)
+        if state is None:
+            if mining.get(probe) not in emptied:
+                continue
+            state = "traveling_to_star"
+        probe.target = None
+        probe.set_target(probe.colony if state == "returning_to_colony" else probe.find_star(), state)
+
+
+def split_fairly(asked, available):
+    """Shares `available` units between (probe, amount) requests that together ask for more.
+
+    Requests below an even share are met in full and the rest share what is
+    left evenly. Units that do not divide go one each to the probes with the
+    emptiest holds, ties broken by position, so the split never depends on
+    the order the requests came in.
+    """
+    count = len(asked)
+    amounts = [0] * count
+    left = available
+    order = sorted(range(count), key=lambda i: asked[i][1])
+    for position, i in enumerate(order):
+        share = left // (count - position)
+        if asked[i][1] > share:  # This one and every larger request get the even share
+            for j in order[position:]:
+                amounts[j] = share
+            left -= share * (count - position)
+            break
+        amounts[i] = asked[i][1]
+        left -= asked[i][1]
+    if left > 0:
+        short = [i for i in range(count) if amounts[i] < asked[i][1]]
+        short.sort(key=lambda i: (sum(asked[i][0].cargo), asked[i][0].x, asked[i][0].y))
+        for i in short[:left]:
+            amounts[i] += 1
+    return amounts
+
+# --------------------------
+# Grid Class
+# --------------------------
+class Grid:
+    def __init__(self, cell_size, world_width, world_height):
+        self.cell_size = cell_size
+        self.width_cells = math.ceil(world_width / cell_size)
+        self.height_cells = math.ceil(world_height / cell_size)
+        self.cells = {}  # (cell_x, cell_y) -> (probe, x, y) entries, only for occupied cells
+
+    def clear(self):
+        """Clears the grid at the beginning of each frame."""
+        self.cells.clear()
+
+    def add_probe(self, probe, x=None, y=None):
+        """Adds a probe to the grid at (x, y), by default its own position."""
+        if x is None:
+            x, y = probe.x, probe.y
+        cell_x = int(x // self.cell_size)
+        cell_y = int(y // self.cell_size)
+        if 0 <= cell_x < self.width_cells and 0 <= cell_y < self.height_cells:  # Check bounds
+            bucket = self.cells.get((cell_x, cell_y))
+            if bucket is None:
+                self.cells[(cell_x, cell_y)] = [(probe, x, y)]
+            else:
+                bucket.append((probe, x, y))
+
+    def get_nearby_probes(self, probe):
+        """Gets nearby probes for a given probe, checking neighboring cells."""
+        nearby_probes = []
+        cell_x = int(probe.x // self.cell_size)
+        cell_y = int(probe.y // self.cell_size)
+
+        # Check current and neighboring cells (including diagonals)
+        for dx in range(-1, 2):
+            for dy in range(-1, 2):
+                bucket = self.cells.get((cell_x + dx, cell_y + dy))
+                if bucket:
+                    nearby_probes.extend(entry[0] for entry in bucket)  # Extend to add all probes from the cell
+        return nearby_probes
+
+    def nearby_pairs(self, radius):
+        """Yields each unordered pair of probes within `radius` of each other exactly once.
+
+        Every cell is paired with itself and with the four neighbours ahead of
+        it, so a pair is never visited from both ends. Needs cell_size >= radius.
+        Distances use the positions the probes were added at.
+        """
+        if radius > self.cell_size:
+            raise ValueError(f"radius {radius} is larger than the grid cell size {self.cell_size}")
+        radius_sq = radius * radius
+        cells = self.cells
+        for (cell_x, cell_y), bucket in cells.items():
+            for i, (probe, x, y) in enumerate(bucket):
+                for other_probe, other_x, other_y in bucket[i + 1:]:
+                    dx = x - other_x
+                    dy = y - other_y
+                    if dx * dx + dy * dy <= radius_sq:
+                        yield probe, other_probe
+            for dx, dy in ((1, -1), (1, 0), (1, 1), (0, 1)):
+                other_bucket = cells.get((cell_x + dx, cell_y + dy))
+                if not other_bucket:
+                    continue
+                for probe, x, y in bucket:
+                    for other_probe, other_x, other_y in other_bucket:
+                        ddx = x - other_x
+                        ddy = y - other_y
+                        if ddx * ddx + ddy * ddy <= radius_sq:
+                            yield probe, other_probe
+
+# --------------------------
+# Random Streams
+# --------------------------
+def rng_stream(seed, name):
+    """A reproducible RNG for one subsystem of a seeded run, independent of every other stream."""
+    return random.Random(f"{seed}:{name}")
+
+# --------------------------
+# Galaxy Generation Function (Modified)
+# --------------------------
+def generate_galaxy(world_width, world_height, num_stars, seed=None):
+    """Builds a seeded galaxy; positions and size_mod come from the batched sampler in galaxy.py."""
+    rng = random.Random(seed)  # Star colours and research, kept apart from the placement stream
+    xs, ys, size_mods = place_stars(world_width, world_height, num_stars, MIN_STAR_DISTANCE,
+                                    seed=rng.getrandbits(64))
+    center_x = world_width // 2  # Center of the world for distance calculation
+    center_y = world_height // 2
+
+    stars = []
+    for x, y, size_mod in zip(xs, ys, size_mods):
+        star = Star(x, y, size_mod, rng=rng)  # Create star object
+        star.distance_to_center = math.hypot(x - center_x, y - center_y)  # Calculate and store distance
+        stars.append(star)
+    return stars
+
+# --------------------------
+# Simulation Class
+# --------------------------
+class Simulation:
+    """Owns the world state and advances it one fixed tick at a time, independent of any display."""
+
+    def __init__(self, world_width=None, world_height=None, num_stars=None, vectorised=False, seed=None, stars=None,
+                 config=None, chunked=False, galaxy_cache=None):
+        """World size and star count default to `config`'s (SimConfig defaults if None); explicit ones override it.
+
+        With chunked=True stars are generated chunk by chunk as probes reach
+        them (see chunks.py) instead of all up front, for worlds too large to
+        build whole; `stars` is then the ChunkedGalaxy. `galaxy_cache` is a
+        directory to load the generated galaxy from and save it to (see
+        galaxy_cache.py).
+        """
+        if config is None:
+            config = DEFAULT_CONFIG
+        sizes = {name: value for name, value in (("world_width", world_width), ("world_height", world_height),
+                                                 ("num_stars", num_stars)) if value is not None}
+        if sizes:
+            config = config.replace(**sizes)
+        self.config = config
+        world_width = self.world_width = config.world_width
+        world_height = self.world_height = config.world_height
+        num_stars = config.num_stars
+        if seed is None:
+            seed = random.randrange(2 ** 32)  # Kept, so even an unseeded run can be regenerated
+        self.seed = seed
+        self.galaxy = None
+        star_index = None
+        if chunked:
+            from chunks import ChunkedGalaxy
+            stars = self.galaxy = ChunkedGalaxy(world_width, world_height, num_stars, seed, MIN_STAR_DISTANCE, Star)
+            star_index = self.galaxy.index
+        elif stars is None and galaxy_cache is not None:
+            from galaxy_cache import load_galaxy
+            stars = load_galaxy(world_width, world_height, num_stars, seed, galaxy_cache)  # Sorted already
+        elif stars is None:  # Callers restoring a saved world pass its stars in
+            stars = generate_galaxy(world_width, world_height, num_stars, seed)
+            stars.sort(key=lambda star: star.distance_to_center)  # Sort stars by distance to center ONCE
+        self.stars = stars
+        self.colony = Colony(world_width // 2, world_height // 2, self.stars, star_index,
+                             rng=rng_stream(seed, "anomalies"), config=config)
+        self.probes = [Probe(world_width // 2, world_height // 2, self.stars, self.colony)]
+        self.tick = 0
+
+        self.stranded = set()  # Idle probes the assignment stage found no star for, until a star is added
+        self.colony.star_index.added_listeners.append(self._star_added)
+        self.vectorised = vectorised
+        self.engine = None  # Built on the first step, so the probe list can still be swapped out before then
+
+        # --- Grid Initialization ---
+        grid_cell_size = config.communication_radius  # Neighbouring cells then cover the communication radius exactly
+        self.probe_grid = Grid(grid_cell_size, world_width, world_height)
+        # --- End Grid Initialization ---
+
+    def step(self):
+        """Advances the simulation by exactly one tick."""
+        if PROFILER.enabled:
+            with PROFILER.phase("probe_update"):
+                self.update_probes()
+            with PROFILER.phase("colony_update"):
+                self.update_colony()
+            with PROFILER.phase("grid_rebuild"):
+                self.rebuild_grid()
+            with PROFILER.phase("communicate"):
+                self.communicate()
+        else:
+            self.update_probes()  # Update, Replicate:
+            self.update_colony()
+            self.rebuild_grid()  # --- Grid Update and Communication ---
+            self.communicate()
+        if self.galaxy is not None:  # Between ticks, when no search is walking the index or holding a star
+            self.galaxy.load_requested()
+            self.galaxy.evict()
+        self.tick += 1
+        EVENTS.tick = self.tick
+
+    def update_probes(self):
+        if self.vectorised:
+            if self.engine is None:  # NumPy is only needed when the batched engine is requested
+                from vector_engine import VectorProbeEngine
+                self.engine = VectorProbeEngine()
+            self.engine.sync(self.probes)  # Pick up probes built since the last tick
+            self.engine.step(self.assign_targets)
+        else:
+            arrived = []
+            idle = []
+            for probe in self.probes:
+                if probe.replication_cooldown > 0:
+                    probe.replication_cooldown -= 1
+                if probe.target:
+                    if probe.move():
+                        arrived.append(probe)
+                else:  # Picks its star in the assignment stage below instead
+                    idle.append(probe)
+            if arrived:
+                resolve_arrivals(arrived)
+            if idle:
+                self.assign_targets(idle)
+
+    def assign_targets(self, probes):
+        """Assignment stage: picks stars for every probe that started the tick idle, in one pass.
+
+        Probes go in list order against the star index's claim book, so each
+        sees what the ones before it booked and nearby probes spread out
+        instead of racing for a star that will be empty when they get there. A probe
+        that gets nothing is left out of later passes until the index gains a
+        star (a chunk loading): its cargo and visited stars stay put while it
+        idles, and otherwise the index only loses stars.
+        """
+        stranded = self.stranded
+        for probe in probes:
+            if probe in stranded:
+                continue
+            probe.choose_target()
+            if probe.target is None:
+                stranded.add(probe)
+
+    def _star_added(self, star):
+        self.stranded.clear()  # Any of them might reach the new star
+
+    def update_colony(self):
+        self.colony.update(self.probes)
+
+    def rebuild_grid(self):
+        grid = self.probe_grid
+        grid.clear()  # Clear the grid at the start of each tick
+        probes = self.probes
+        start = 0
+        if self.engine is not None:  # Its arrays hold the positions; the Probe objects may lag
+            start = len(self.engine)
+            for probe, x, y in zip(probes, *self.engine.positions()):
+                grid.add_probe(probe, x, y)
+        for probe in probes[start:]:  # Probes built this tick, not in the engine yet
+            grid.add_probe(probe)  # Add each probe to the grid
+
+    def sync_probes(self):
+        """Brings every Probe object's position and cooldown up to date, for readers outside the tick."""
+        if self.engine is not None:
+            self.engine.write_back()
+
+    def communicate(self):
+        pairs = 0
+        for probe, other_probe in self.probe_grid.nearby_pairs(self.config.communication_radius):
+            probe.share_with(other_probe)  # Each pair in range swaps what it learned since last time
+            pairs += 1
+        if PROFILER.enabled:
+            PROFILER.count("communicate_pairs", pairs)
@@ -0,0 +1,441 @@
+"""Local spectator server and viewer: watch a headless run from another process.
+
+The simulation side publishes at most PUBLISH_RATE frames a second, only
+while someone is watching, and less often when a frame takes long enough
+to cost the simulation more than PUBLISH_SHARE of its time. A frame holds only what changed since the
+previous one:
+- positions of the probes that moved, quantised to 1/QUANTUM world units
+  and sent as deltas;
+- probes that changed state or target;
+- stars that ran out of something;
+- the colony totals.
+Each frame is encoded once, on the simulation's thread, and the same bytes
+go to every viewer. Viewers get a keyframe with every star and probe when
+they connect, and again if they fall too far behind to catch up:
+
+    python headless.py --ticks 1000000 --spectate 7878
+    python spectator.py --port 7878  # in another terminal
+
+A message is a u32 length, then a u32 header length, a JSON header naming
+the arrays, and the raw arrays zlib-compressed, all little-endian.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import socket
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from checkpoint import TARGET_COLONY, TARGET_EXPLORATION, TARGET_NONE, TARGET_STAR, star_arrays, stars_from_arrays
+from simulation import Colony, ExplorationTarget, Star
+from stats import PROBE_STATES
+
+DEFAULT_PORT = 7878
+PUBLISH_RATE = 30  # Frames a second at most, however fast the simulation runs
+QUANTUM = 8  # Positions travel in 1/QUANTUM world units
+PUBLISH_SHARE = 0.1  # Most of the simulation thread's time that publishing may take
+MAX_BUFFERED = 1 << 20  # Bytes queued for a viewer before it is skipped, then resynced with a keyframe
+WARP_SYNC = 10  # Ticks between settled frames under the time-warp runner
+
+STATE_CODES = {state: code for code, state in enumerate(PROBE_STATES)}
+TARGET_KINDS = {type(None): TARGET_NONE, Star: TARGET_STAR, Colony: TARGET_COLONY,
+                ExplorationTarget: TARGET_EXPLORATION}
+ORIGIN = ExplorationTarget(0, 0, None)  # Stands in for a missing target so every probe has target coordinates
+PROBE_FIELDS = ("x", "y", "state", "target_kind", "target_x", "target_y")
+
+
+# --------------------------
+# Messages
+# --------------------------
+def encode_message(meta, arrays):
+    """One framed message: JSON `meta` plus named NumPy arrays."""
+    entries = []
+    chunks = []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        entries.append([name, array.dtype.str, list(array.shape)])
+        chunks.append(array.tobytes())
+    header = json.dumps({"meta": meta, "arrays": entries}).encode()
+    body = zlib.compress(b"".join(chunks), 1)
+    return struct.pack("<II", 4 + len(header) + len(body), len(header)) + header + body
+
+
+def decode_message(payload):
+    """(meta, arrays) from a message without its length prefix. Arrays are read-only views."""
+    (header_length,) = struct.unpack_from("<I", payload)
+    header = json.loads(payload[4:4 + header_length])
+    body = zlib.decompress(payload[4 + header_length:])
+    arrays = {}
+    offset = 0
+    for name, dtype, shape in header["arrays"]:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(body, dtype, count, offset).reshape(shape) if count else np.zeros(shape, dtype)
+        offset += count * dtype.itemsize
+    return header["meta"], arrays
+
+
+def _quantise(values):
+    return np.round(values * QUANTUM).astype(np.int32)
+
+
+def _narrow(values):
+    """int16 when every value fits, as most per-frame moves do; int32 otherwise."""
+    if len(values) and np.abs(values).max() > 32767:
+        return values.astype(np.int32)
+    return values.astype(np.int16)
+
+
+# --------------------------
+# Server
+# --------------------------
+def capture_probes(probes):
+    """The probe fields a viewer draws, as arrays; positions already quantised."""
+    count = len(probes)
+    targets = [probe.target for probe in probes]
+    placed = [target if target is not None else ORIGIN for target in targets]
+    return {
+        "x": _quantise(np.fromiter((probe.x for probe in probes), np.float64, count)),
+        "y": _quantise(np.fromiter((probe.y for probe in probes), np.float64, count)),
+        "state": np.fromiter((STATE_CODES[probe.state] for probe in probes), np.uint8, count),
+        "target_kind": np.fromiter((TARGET_KINDS[type(target)] for target in targets), np.uint8, count),
+        "target_x": _quantise(np.fromiter((target.x for target in placed), np.float64, count)),
+        "target_y": _quantise(np.fromiter((target.y for target in placed), np.float64, count)),
+    }
+
+
+def probe_delta(previous, current):
+    """Arrays turning `previous` (a capture_probes result) into `current`. Probes are only ever appended."""
+    old = len(previous["x"])
+    moved = np.flatnonzero((current["x"][:old] != previous["x"]) | (current["y"][:old] != previous["y"]))
+    changed = np.flatnonzero(current["state"][:old] != previous["state"])
+    retargeted = np.flatnonzero((current["target_kind"][:old] != previous["target_kind"]) |
+                                (current["target_x"][:old] != previous["target_x"]) |
+                                (current["target_y"][:old] != previous["target_y"]))
+    arrays = {
+        "moved": moved.astype(np.uint32),
+        "dx": _narrow(current["x"][moved] - previous["x"][moved]),
+        "dy": _narrow(current["y"][moved] - previous["y"][moved]),
+        "changed": changed.astype(np.uint32),
+        "state": current["state"][changed],
+        "retargeted": retargeted.astype(np.uint32),
+        "target_kind": current["target_kind"][retargeted],
+        "target_x": current["target_x"][retargeted],
+        "target_y": current["target_y"][retargeted],
+    }
+    for name in PROBE_FIELDS:
+        arrays["new_" + name] = current[name][old:]
+    return arrays
+
+
+class SpectatorServer:
+    """Streams `simulation` to viewers over TCP from an asyncio loop on its own thread.
+
+    Call `on_tick(simulation)` from the simulation's thread after every
+    step (or every settled tick under time warp) and `close()` at the end.
+    With nobody connected, `on_tick` returns straight away.
+    """
+
+    def __init__(self, simulation, port=DEFAULT_PORT, host="127.0.0.1", rate=PUBLISH_RATE):
+        if simulation.galaxy is not None:
+            raise ValueError("chunked galaxies cannot be spectated: their stars come and go, so they have no fixed IDs")
+        self.simulation = simulation
+        self.interval = 1 / rate
+        self.star_ids = {star: star_id for star_id, star in enumerate(simulation.stars)}
+        self.changed_stars = set()  # Stars that ran out of something since the last frame
+        self.previous = None  # Probe arrays as of the last frame sent
+        self.next_publish = 0.0
+        self.keyframe_wanted = False
+        self.frames = 0
+        self.bytes = 0  # Of frames sent, not counting keyframes
+        self.viewers = 0  # Read by the simulation thread; the loop thread owns `clients`
+        self.clients = {}  # StreamWriter -> True while it waits for a keyframe
+        self.error = None
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._serve, args=(host, port), name="spectator", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        simulation.colony.star_index.listeners.append(self.changed_stars.add)
+
+    # --- Simulation thread ---
+    def on_tick(self, simulation):
+        if not self.viewers:
+            self.previous = None
+            self.changed_stars.clear()
+            return
+        start = time.perf_counter()
+        if start >= self.next_publish:
+            self.publish(simulation)
+            cost = time.perf_counter() - start
+            self.next_publish = start + max(self.interval, cost / PUBLISH_SHARE)  # Big runs publish less often
+
+    def publish(self, simulation):
+        """Encodes one frame (and a keyframe if a viewer needs one) and hands them to the loop."""
+        simulation.sync_probes()
+        current = capture_probes(simulation.probes)
+        colony = simulation.colony
+        meta = {
+            "tick": simulation.tick,
+            "colony": [colony.minerals, colony.gases, colony.energy, colony.research],
+            "research_labs": colony.research_labs,
+            "probe_speed_researched": colony.probe_speed_researched,
+        }
+        frame = keyframe = None
+        if self.previous is not None:
+            changed = sorted(self.star_ids[star] for star in self.changed_stars)
+            stars = simulation.stars
+            arrays = probe_delta(self.previous, current)
+            arrays["star_ids"] = np.array(changed, dtype=np.uint32)
+            arrays["star_resources"] = np.array([stars[star_id].resources for star_id in changed],
+                                                dtype=np.int64).reshape(len(changed), 4)
+            frame = encode_message({"kind": "delta", **meta}, arrays)
+            self.frames += 1
+            self.bytes += len(frame)
+        self.changed_stars.clear()
+        if self.keyframe_wanted or self.previous is None:
+            self.keyframe_wanted = False
+            meta.update(kind="keyframe", quantum=QUANTUM, world_width=simulation.world_width,
+                        world_height=simulation.world_height, colony_x=colony.x, colony_y=colony.y)
+            keyframe = encode_message(meta, {**star_arrays(simulation.stars), **current})
+        self.previous = current
+        self.loop.call_soon_threadsafe(self._broadcast, frame, keyframe)
+
+    def close(self):
+        self.simulation.colony.star_index.listeners.remove(self.changed_stars.add)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    # --- Loop thread ---
+    def _serve(self, host, port):
+        loop = self.loop
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(asyncio.start_server(self._connected, host, port))
+        except OSError as error:
+            self.error = error
+            loop.close()
+            self.ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]  # The real one when port 0 asked for any
+        self.ready.set()
+        loop.run_forever()
+        server.close()
+        for writer in self.clients:
+            writer.close()  # Its handler then reads EOF and returns
+        loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop), return_exceptions=True))
+        loop.close()
+
+    async def _connected(self, reader, writer):
+        self.clients[writer] = True
+        self.viewers = len(self.clients)
+        self.keyframe_wanted = True
+        try:
+            await reader.read()  # Viewers never send anything; this returns when they hang up
+        except OSError:
+            pass
+        finally:
+            del self.clients[writer]
+            self.viewers = len(self.clients)
+            writer.close()
+
+    def _broadcast(self, frame, keyframe):
+        for writer, waiting in self.clients.items():
+            if writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                self.clients[writer] = True  # Too far behind to catch up frame by frame; resync once drained
+            elif waiting:
+                if keyframe is not None:
+                    writer.write(keyframe)
+                    self.clients[writer] = False
+                else:
+                    self.keyframe_wanted = True
+            elif frame is not None:
+                writer.write(frame)
+
+
+# --------------------------
+# Viewer
+# --------------------------
+class SpectatorState:
+    """A viewer's copy of the simulation, replaced by keyframes and advanced by deltas."""
+
+    def __init__(self):
+        self.tick = None
+        self.stars = []
+        self.probes = {name: np.zeros(0, dtype=np.int32) for name in PROBE_FIELDS}
+        self.quantum = QUANTUM
+
+    def apply(self, meta, arrays):
+        """Applies one message; returns the stars whose resources changed."""
+        self.tick = meta["tick"]
+        self.colony = meta["colony"]
+        self.research_labs = meta["research_labs"]
+        self.probe_speed_researched = meta["probe_speed_researched"]
+        probes = self.probes
+        if meta["kind"] == "keyframe":
+            self.quantum = meta["quantum"]
+            self.world_width, self.world_height = meta["world_width"], meta["world_height"]
+            self.colony_x, self.colony_y = meta["colony_x"], meta["colony_y"]
+            self.stars = stars_from_arrays(arrays)
+            for name in PROBE_FIELDS:
+                probes[name] = np.array(arrays[name])
+            return []
+
+        moved = arrays["moved"]
+        probes["x"][moved] += arrays["dx"]
+        probes["y"][moved] += arrays["dy"]
+        probes["state"][arrays["changed"]] = arrays["state"]
+        retargeted = arrays["retargeted"]
+        for name in ("target_kind", "target_x", "target_y"):
+            probes[name][retargeted] = arrays[name]
+        for name in PROBE_FIELDS:
+            if len(arrays["new_" + name]):
+                probes[name] = np.concatenate((probes[name], arrays["new_" + name]))
+        changed = []
+        for star_id, resources in zip(arrays["star_ids"].tolist(), arrays["star_resources"].tolist()):
+            star = self.stars[star_id]
+            star.resources = resources
+            changed.append(star)
+        return changed
+
+
+def receive_messages(sock, inbox):
+    """Reads messages off `sock` into `inbox` until the server goes away, then appends None."""
+    stream = sock.makefile("rb")
+    try:
+        while True:
+            prefix = stream.read(4)
+            if len(prefix) < 4:
+                break
+            (length,) = struct.unpack("<I", prefix)
+            payload = stream.read(length)
+            if len(payload) < length:
+                break
+            inbox.append((decode_message(payload), len(payload) + 4))
+    except OSError:
+        pass
+    inbox.append(None)
+
+
+def view(host, port):
+    """Opens a window drawing the stream from a spectator server, with the main viewer's drawing code."""
+    import pygame
+
+    from render import HEIGHT, FRAME_RATE, WIDTH, ProbeDensityLayer, StarLayer, draw_colony, draw_probes
+
+    sock = socket.create_connection((host, port))
+    inbox = collections.deque()  # Appends and pops from either end are thread-safe
+    threading.Thread(target=receive_messages, args=(sock, inbox), name="spectator-receive", daemon=True).start()
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption(f"Spectating {host}:{port}")
+    clock = pygame.time.Clock()
+    font = pygame.font.Font(None, 30)
+    density_layer = ProbeDensityLayer()
+    state = SpectatorState()
+    star_layer = colony = None
+    zoom_level = 1.0
+    offset_x = offset_y = 0.0
+    mouse_x, mouse_y = 0, 0
+    received = collections.deque()  # (time, bytes) over the last second, for the HUD
+    running = connected = True
+
+    while running:
+        clock.tick(FRAME_RATE)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.MOUSEWHEEL:
+                mouse_x, mouse_y = pygame.mouse.get_pos()
+                world_x, world_y = offset_x + mouse_x / zoom_level, offset_y + mouse_y / zoom_level
+                zoom_level = max(0.1, min(zoom_level + event.y * 0.1, 5.0))
+                offset_x, offset_y = world_x - mouse_x / zoom_level, world_y - mouse_y / zoom_level
+            elif event.type == pygame.MOUSEMOTION:
+                mouse_x, mouse_y = event.pos
+                if event.buttons[0]:
+                    offset_x -= event.rel[0] / zoom_level
+                    offset_y -= event.rel[1] / zoom_level
+
+        now = time.perf_counter()
+        while inbox:
+            message = inbox.popleft()
+            if message is None:
+                connected = False
+                break
+            (meta, arrays), size = message
+            received.append((now, size))
+            first = state.tick is None
+            changed = state.apply(meta, arrays)
+            if meta["kind"] == "keyframe":
+                star_layer = StarLayer(state.stars)
+                colony = Colony.__new__(Colony)  # Only its position is drawn
+                colony.x, colony.y = state.colony_x, state.colony_y
+                if first:
+                    offset_x = state.colony_x - WIDTH / (2 * zoom_level)
+                    offset_y = state.colony_y - HEIGHT / (2 * zoom_level)
+            for star in changed:
+                star_layer.mark_dirty(star)
+        while received and received[0][0] < now - 1.0:
+            received.popleft()
+
+        if star_layer is None:
+            screen.fill((0, 0, 0))
+            screen.blit(font.render(f"Waiting for {host}:{port}...", True, (255, 255, 255)), (10, 10))
+            pygame.display.flip()
+            if not connected:
+                running = False
+            continue
+
+        star_layer.draw(screen, offset_x, offset_y, zoom_level)
+        probes = state.probes
+        xs = probes["x"] / state.quantum
+        ys = probes["y"] / state.quantum
+        target_xs = probes["target_x"] / state.quantum
+        target_ys = probes["target_y"] / state.quantum
+        has_target = probes["target_kind"] != TARGET_NONE
+        draw_probes(screen, density_layer, xs, ys, target_xs, target_ys, has_target, offset_x, offset_y, zoom_level)
+        draw_colony(colony, screen, offset_x, offset_y, zoom_level)
+
+        radius = 5 * zoom_level  # Same test as Probe.is_hovered
+        draw_xs = ((xs - offset_x) * zoom_level).astype(np.int64)
+        draw_ys = ((ys - offset_y) * zoom_level).astype(np.int64)
+        hovered = np.flatnonzero((np.abs(draw_xs - mouse_x) <= radius) & (np.abs(draw_ys - mouse_y) <= radius))
+        for index in hovered.tolist():
+            tooltip = font.render(f"Status: {PROBE_STATES[probes['state'][index]]}", True, (255, 255, 255))
+            screen.blit(tooltip, (mouse_x + 10, mouse_y + 10))
+
+        minerals, gases, energy, research = state.colony
+        lines = [
+            f"Colony: Min={minerals}, Gas={gases}, Energy={energy}, Research={research}",
+            f"Probes: {len(xs)}, Labs: {state.research_labs}",
+            f"Tick {state.tick}, {sum(size for _, size in received) / 1024:.1f} KiB/s"
+            + ("" if connected else " (disconnected)"),
+        ]
+        for row, line in enumerate(lines):
+            screen.blit(font.render(line, True, (255, 255, 255)), (10, 10 + row * 30))
+        pygame.display.flip()
+
+    sock.close()
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch a run streamed by headless.py --spectate.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    view(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
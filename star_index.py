@@ -0,0 +1,185 @@
+import math
+
+RESOURCE_TYPES = ("minerals", "gases", "energy", "research")
+MINERALS, GASES, ENERGY, RESEARCH = RESOURCES = tuple(range(len(RESOURCE_TYPES)))  # Indices into resource arrays
+STAR_INDEX_CELL_SIZE = 100  # Roughly one star per cell at the default galaxy density
+
+
+# --------------------------
+# Star Index Class
+# --------------------------
+class StarIndex:
+    """Bucketed grid over stars with one sub-grid per resource type.
+
+    A star sits in a resource's sub-grid while it still holds some of that
+    resource, so "nearest star with minerals" never looks at mined-out stars.
+    Stars point back at the index and drop out of a sub-grid as soon as
+    `Star.mine_resource` empties that resource.
+
+    The index also books claims: a probe heading for a star registers how
+    fast it will mine each resource there, so later searches can skip stars
+    the probes already on their way would empty before a newcomer arrives.
+
+    With a `loader` (see chunks.ChunkedGalaxy) the index only holds the
+    stars loaded so far, and searches ask it to load the area they are about
+    to scan first.
+    """
+
+    def __init__(self, stars=(), cell_size=STAR_INDEX_CELL_SIZE):
+        self.cell_size = cell_size
+        self.grids = [{} for _ in RESOURCES]  # Resource ID -> {(cell_x, cell_y): [stars]}
+        self.min_cell_x = self.min_cell_y = 0
+        self.max_cell_x = self.max_cell_y = -1
+        self.listeners = []  # Called with the star whenever one of its resources runs out
+        self.added_listeners = []  # Called with every star added after construction, e.g. from a loaded chunk
+        self.journal = None  # Set to a list to record every (star, resource, amount) mined
+        self.claimed = {}  # Star -> per-resource units per tick drawn by probes headed there or mining it
+        # Called as loader(min_x, min_y, max_x, max_y) before a search scans that box; returns the box now
+        # covered, which may be larger. Set by lazily generated galaxies, which also fix the cell bounds.
+        self.loader = None
+        self.max_search_ring = None  # Rings a search gives up after; None searches the whole index
+        for star in stars:
+            self.add(star)
+
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def add(self, star):
+        """Indexes a star under every resource it still holds."""
+        star.index = self
+        cell = self.cell_of(star.x, star.y)
+        if self.max_cell_x < self.min_cell_x:  # First star defines the bounds
+            self.min_cell_x = self.max_cell_x = cell[0]
+            self.min_cell_y = self.max_cell_y = cell[1]
+        else:
+            self.min_cell_x = min(self.min_cell_x, cell[0])
+            self.max_cell_x = max(self.max_cell_x, cell[0])
+            self.min_cell_y = min(self.min_cell_y, cell[1])
+            self.max_cell_y = max(self.max_cell_y, cell[1])
+        for resource, amount in enumerate(star.resources):
+            if amount > 0:
+                self.grids[resource].setdefault(cell, []).append(star)
+        for listener in self.added_listeners:
+            listener(star)
+
+    def remove(self, star):
+        """Unindexes a star entirely, e.g. when its chunk is evicted. Listeners are not told; it did not run dry."""
+        cell = self.cell_of(star.x, star.y)
+        for resource, grid in enumerate(self.grids):
+            bucket = grid.get(cell)
+            if bucket and star in bucket:
+                bucket.remove(star)
+                if not bucket:
+                    del grid[cell]
+        star.index = None
+
+    def mined(self, star, resource, amount):
+        """Called by `Star.mine_resource`; drops the star from a sub-grid once that resource runs out."""
+        if self.journal is not None:
+            self.journal.append((star, resource, amount))
+        if star.resources[resource] <= 0:
+            self.discard(star, resource)
+
+    def discard(self, star, resource):
+        """Removes a star from one resource's sub-grid (no-op if it is not there)."""
+        grid = self.grids[resource]
+        cell = self.cell_of(star.x, star.y)
+        bucket = grid.get(cell)
+        if bucket and star in bucket:
+            bucket.remove(star)
+            if not bucket:
+                del grid[cell]
+            for listener in self.listeners:
+                listener(star)
+
+    # --- Claims ---
+    def claim(self, probe, star, rates):
+        """Books `probe` as drawing `rates[resource]` per tick from `star`, replacing any earlier claim."""
+        self.release(probe)
+        if not any(rates):
+            return
+        probe.claim = (star, rates)
+        draw = self.claimed.get(star)
+        if draw is None:
+            self.claimed[star] = list(rates)
+        else:
+            for resource, rate in enumerate(rates):
+                draw[resource] += rate
+
+    def release(self, probe):
+        """Drops the probe's claim, if it has one."""
+        if probe.claim is None:
+            return
+        star, rates = probe.claim
+        probe.claim = None
+        draw = self.claimed[star]
+        for resource, rate in enumerate(rates):
+            draw[resource] -= rate
+        if not any(draw):
+            del self.claimed[star]
+
+    # --- Queries ---
+    def nearest(self, x, y, resources, exclude=(), speed=None):
+        """Returns the nearest star holding any of the `resources` IDs that is not in `exclude`, or None.
+
+        Given the searching probe's `speed`, a star only counts for a
+        resource if its claimants would not have mined it out by the time
+        the probe got there. Scans rings of cells outward from (x, y) and
+        stops once no unscanned ring can hold anything closer than the best
+        star found so far.
+        """
+        loader = self.loader
+        grids = [(resource, self.grids[resource]) for resource in resources]
+        if loader is None and not any(grid for _, grid in grids):
+            return None
+        claimed = self.claimed if speed else {}
+
+        cell_x, cell_y = self.cell_of(x, y)
+        max_ring = max(
+            abs(cell_x - self.min_cell_x), abs(cell_x - self.max_cell_x),
+            abs(cell_y - self.min_cell_y), abs(cell_y - self.max_cell_y),
+        )
+        if self.max_search_ring is not None:
+            max_ring = min(max_ring, self.max_search_ring)
+        nearest_star = None
+        nearest_distance = float('inf')
+        cell_size = self.cell_size
+        loaded = (0, 0, -1, -1)  # World box the loader has covered so far
+
+        for ring in range(max_ring + 1):
+            if loader is not None:
+                box = ((cell_x - ring) * cell_size, (cell_y - ring) * cell_size,
+                       (cell_x + ring + 1) * cell_size, (cell_y + ring + 1) * cell_size)
+                if not (loaded[0] <= box[0] and loaded[1] <= box[1] and box[2] <= loaded[2] and box[3] <= loaded[3]):
+                    loaded = loader(*box)
+            for cell in self._ring_cells(cell_x, cell_y, ring):
+                for resource, grid in grids:
+                    bucket = grid.get(cell)
+                    if not bucket:
+                        continue
+                    for star in bucket:
+                        if star in exclude:
+                            continue
+                        distance = math.hypot(star.x - x, star.y - y)
+                        if distance < nearest_distance:
+                            if star in claimed and star.resources[resource] <= claimed[star][resource] * distance / speed:
+                                continue
+                            nearest_distance = distance
+                            nearest_star = star
+            # Every cell in ring + 1 is at least ring * cell_size away from (x, y)
+            if nearest_distance <= ring * cell_size:
+                break
+        return nearest_star
+
+    @staticmethod
+    def _ring_cells(cell_x, cell_y, ring):
+        """Yields the cells at Chebyshev distance `ring` from (cell_x, cell_y)."""
+        if ring == 0:
+            yield cell_x, cell_y
+            return
+        for dx in range(-ring, ring + 1):
+            yield cell_x + dx, cell_y - ring
+            yield cell_x + dx, cell_y + ring
+        for dy in range(-ring + 1, ring):
+            yield cell_x - ring, cell_y + dy
+            yield cell_x + ring, cell_y + dy
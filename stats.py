@@ -0,0 +1,180 @@
+"""Run statistics kept up to date where state changes, and streamed out as JSONL or CSV.
+
+Counters move only at the few places that change what they count
+(Star.mine_resource, Colony.deposit, Probe.set_target, probe construction),
+so taking a sample never rescans stars or probes. Call sites check the
+switch first, so a disabled layer costs one attribute read:
+
+    if STATS.enabled:
+        STATS.mined(star, resource, amount)
+
+`attach()` seeds the counters from a simulation with one full scan, e.g.
+after loading a checkpoint, and switches them on. Under the time-warp
+runner, mining is counted when a probe is settled, so samples can trail
+by up to a probe's sleep.
+"""
+import collections
+import csv
+import json
+
+from star_index import RESOURCE_TYPES
+
+HEATMAP_CELL_SIZE = 500  # World units per side of a heatmap cell
+STATS_EVERY = 100  # Ticks between exported samples
+
+PROBE_STATES = ("idle", "traveling_to_star", "traveling_to_star_for_research", "returning_to_colony")
+
+
+# --------------------------
+# Stats Class
+# --------------------------
+class Stats:
+    """Counters for one simulation. Everything is a running total; rates come from differences between samples."""
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.mined_totals = [0, 0, 0, 0]  # By resource ID
+        self.delivered_totals = [0, 0, 0, 0]  # Everything deposited at the colony, anomaly bonuses included
+        self.bonus_totals = [0, 0, 0, 0]  # The part of delivered_totals no probe mined
+        self.depleted_stars = 0
+        self.states = collections.Counter()  # Probe state -> probes in it
+        self.probes_built = 0
+        self.heatmap = collections.Counter()  # (cell_x, cell_y) -> star targets assigned there
+        self.last_tick = None
+        self.last_mined = None
+
+    def attach(self, simulation):
+        """Seeds every counter from the simulation as it is now and enables the hooks."""
+        self.reset()
+        for probe in simulation.probes:
+            self.states[probe.state] += 1
+            for resource, amount in enumerate(probe.cargo):
+                self.mined_totals[resource] += amount  # Cargo on board is in flight
+        self.depleted_stars = sum(1 for star in simulation.stars if star.total_resources() <= 0)
+        self.last_tick = simulation.tick
+        self.last_mined = list(self.mined_totals)
+        self.enabled = True
+
+    # --- Hooks ---
+    def mined(self, star, resource, amount):
+        self.mined_totals[resource] += amount
+        if star.resources[resource] <= 0 and star.total_resources() <= 0:
+            self.depleted_stars += 1
+
+    def delivered(self, minerals, gases, energy, research):
+        totals = self.delivered_totals
+        totals[0] += minerals
+        totals[1] += gases
+        totals[2] += energy
+        totals[3] += research
+
+    def bonus(self, amount):
+        """An anomaly's bonus, deposited in minerals, gases and energy alike."""
+        totals = self.bonus_totals
+        totals[0] += amount
+        totals[1] += amount
+        totals[2] += amount
+
+    def state_changed(self, old, new):
+        states = self.states
+        states[old] -= 1
+        states[new] += 1
+
+    def probe_built(self, probe):
+        self.probes_built += 1
+        self.states[probe.state] += 1
+
+    def target_assigned(self, star):
+        self.heatmap[(int(star.x // HEATMAP_CELL_SIZE), int(star.y // HEATMAP_CELL_SIZE))] += 1
+
+    # --- Export ---
+    def sample(self, tick):
+        """A flat dict of every counter at `tick`, plus per-tick mining rates since the previous sample."""
+        row = {"tick": tick, "probes": sum(self.states.values()), "probes_built": self.probes_built,
+               "depleted_stars": self.depleted_stars}
+        for state in PROBE_STATES:
+            row[f"state_{state}"] = self.states[state]
+        elapsed = tick - self.last_tick if self.last_tick is not None else 0
+        for resource, name in enumerate(RESOURCE_TYPES):
+            mined = self.mined_totals[resource]
+            delivered = self.delivered_totals[resource]
+            row[f"mined_{name}"] = mined
+            row[f"delivered_{name}"] = delivered
+            row[f"in_flight_{name}"] = mined - (delivered - self.bonus_totals[resource])
+            row[f"rate_{name}"] = (mined - self.last_mined[resource]) / elapsed if elapsed > 0 else 0.0
+        self.last_tick = tick
+        self.last_mined = list(self.mined_totals)
+        return row
+
+    def heatmap_cells(self):
+        """The heatmap as sorted [cell_x, cell_y, count] triples, only for cells with any targets."""
+        return [[cell_x, cell_y, count] for (cell_x, cell_y), count in sorted(self.heatmap.items())]
+
+
+# --------------------------
+# Writers
+# --------------------------
+class JsonlStatsWriter:
+    """One JSON line per sample, heatmap included."""
+
+    def __init__(self, path):
+        self.file = open(path, "w")
+
+    def write(self, row, heatmap):
+        self.file.write(json.dumps({**row, "heatmap_cell_size": HEATMAP_CELL_SIZE, "heatmap": heatmap}))
+        self.file.write("\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class CsvStatsWriter:
+    """One CSV row per sample. The heatmap does not fit a flat row; use JSONL for it."""
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.writer = None
+
+    def write(self, row, heatmap):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=list(row))
+            self.writer.writeheader()
+        self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def open_stats_writer(path):
+    """A CSV writer for .csv paths, JSONL otherwise."""
+    return CsvStatsWriter(path) if path.endswith(".csv") else JsonlStatsWriter(path)
+
+
+class StatsExporter:
+    """An on_tick callback that writes a sample every `every` ticks."""
+
+    def __init__(self, stats, path, every=STATS_EVERY):
+        self.stats = stats
+        self.every = every
+        self.writer = open_stats_writer(path)
+
+    def on_tick(self, simulation):
+        if simulation.tick % self.every == 0:
+            self.export(simulation.tick)
+
+    def export(self, tick):
+        self.writer.write(self.stats.sample(tick), self.stats.heatmap_cells())
+
+    def close(self, tick):
+        """Writes a final sample unless `tick` already got one."""
+        if tick != self.stats.last_tick:
+            self.export(tick)
+        self.writer.close()
+
+
+STATS = Stats()
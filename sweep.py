@@ -0,0 +1,353 @@
+"""Parameter sweeps: many headless runs over SimConfig variations and seeds, spread over a process pool.
+
+Parameters are SimConfig fields; the cost dicts take a dotted key. A grid
+runs every combination, a sample draws configs uniformly from ranges:
+
+    python sweep.py runs/cooldown --ticks 20000 --seeds 1 2 3 \\
+        --grid replication_cooldown_time=50,100,200 --grid probe_replication_cost.minerals=50,70,90
+    python sweep.py runs/sample --ticks 20000 --seeds 1 2 --sample 64 \\
+        --range communication_radius=100:300 --range num_stars=1000:4000
+    python sweep.py runs/cooldown --summary
+
+Results are columnar: every column is a raw array file that finished runs
+are appended to as they come in, described by columns.json. Loading a
+column is one np.fromfile, however many runs the sweep has, and a sweep
+that was killed part way still loads up to its last finished run.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from events import EVENTS, OFF
+from galaxy_cache import GALAXY_CACHE_DIR, load_galaxy
+from headless import run_headless
+from simulation import DEFAULT_CONFIG, SimConfig, Simulation
+
+SAMPLE_EVERY = 500  # Ticks between probe count samples
+RESULTS_VERSION = 1
+
+METRIC_COLUMNS = (  # name, dtype; one value per run
+    ("run_id", "<i8"),
+    ("seed", "<i8"),
+    ("elapsed", "<f8"),  # Seconds of CPU time in the worker
+    ("probes", "<i8"),
+    ("research_labs", "<i8"),
+    ("first_lab_tick", "<i8"),  # -1 if no lab was built
+    ("delivered_minerals", "<i8"),
+    ("delivered_gases", "<i8"),
+    ("delivered_energy", "<i8"),
+    ("delivered_research", "<i8"),
+)
+
+
+# --------------------------
+# Config Variations
+# --------------------------
+def apply_overrides(config, overrides):
+    """`config` with {parameter: value} applied; "probe_replication_cost.minerals" sets one cost."""
+    changes = {}
+    for name, value in overrides.items():
+        field, _, key = name.partition(".")
+        if not hasattr(config, field):
+            raise ValueError(f"unknown sweep parameter {name!r}")
+        if key:
+            costs = changes.setdefault(field, dict(getattr(config, field)))
+            if key not in costs:
+                raise ValueError(f"unknown sweep parameter {name!r}; {field} has {sorted(costs)}")
+            costs[key] = value
+        else:
+            changes[field] = value
+    return config.replace(**changes)
+
+
+def grid_overrides(axes):
+    """Every combination of {parameter: [values]}, as a list of override dicts."""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def sample_overrides(ranges, count, rng):
+    """`count` override dicts drawn uniformly from {parameter: (low, high)}; integer bounds draw integers."""
+    samples = []
+    for _ in range(count):
+        overrides = {}
+        for name, (low, high) in ranges.items():
+            if isinstance(low, int) and isinstance(high, int):
+                overrides[name] = rng.randint(low, high)
+            else:
+                overrides[name] = rng.uniform(low, high)
+        samples.append(overrides)
+    return samples
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+# --------------------------
+# Worker
+# --------------------------
+def _init_worker():
+    EVENTS.level = OFF  # Nobody reads worker events; recording them only slows the runs down
+
+
+def run_one(job):
+    """Runs one (config, seed) pair headless and returns its row of results."""
+    run_id, base, overrides, seed, ticks, sample_every, vectorised, galaxy_cache = job
+    config = apply_overrides(SimConfig.from_dict(base), overrides)
+    start = time.process_time()
+    simulation = Simulation(vectorised=vectorised, seed=seed, config=config, galaxy_cache=galaxy_cache)
+    colony = simulation.colony
+    probe_counts = [len(simulation.probes)]
+    first_lab_tick = -1
+
+    def on_tick(sim):
+        nonlocal first_lab_tick
+        if first_lab_tick < 0 and colony.research_labs > 0:
+            first_lab_tick = sim.tick
+        if sim.tick % sample_every == 0:
+            probe_counts.append(len(sim.probes))
+
+    run_headless(simulation, ticks, on_tick=on_tick)
+    delivered = colony.delivered
+    row = {
+        "run_id": run_id,
+        "seed": seed,
+        "elapsed": time.process_time() - start,
+        "probes": len(simulation.probes),
+        "research_labs": colony.research_labs,
+        "first_lab_tick": first_lab_tick,
+        "delivered_minerals": delivered[0],
+        "delivered_gases": delivered[1],
+        "delivered_energy": delivered[2],
+        "delivered_research": delivered[3],
+        "probe_count": probe_counts,
+    }
+    row.update(overrides)
+    return row
+
+
+# --------------------------
+# Columnar Results
+# --------------------------
+class ResultsWriter:
+    """Appends one row per finished run to a directory of column files."""
+
+    def __init__(self, path, parameters, ticks, sample_every, base):
+        if os.path.exists(os.path.join(path, "columns.json")):
+            raise FileExistsError(f"{path} already holds sweep results; pick a new directory")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        samples = ticks // sample_every + 1
+        self.columns = {name: {"dtype": dtype, "shape": []} for name, dtype in METRIC_COLUMNS}
+        self.columns["probe_count"] = {"dtype": "<i8", "shape": [samples]}  # Sampled at 0, sample_every, ...
+        for name, dtype in parameters.items():
+            self.columns[name] = {"dtype": dtype, "shape": [], "parameter": True}
+        schema = {
+            "version": RESULTS_VERSION,
+            "ticks": ticks,
+            "sample_every": sample_every,
+            "base_config": base.to_dict(),
+            "columns": self.columns,
+        }
+        with open(os.path.join(path, "columns.json"), "w") as file:
+            json.dump(schema, file, indent=2)
+        self.files = {name: open(os.path.join(path, f"{name}.bin"), "ab") for name in self.columns}
+
+    def append(self, row):
+        for name, column in self.columns.items():
+            file = self.files[name]
+            file.write(np.asarray(row[name], dtype=column["dtype"]).reshape(column["shape"]).tobytes())
+            file.flush()
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+
+def load_results(path):
+    """Returns ({column: array}, schema). Every array has one entry per finished run, in finishing order."""
+    with open(os.path.join(path, "columns.json")) as file:
+        schema = json.load(file)
+    columns = {}
+    for name, column in schema["columns"].items():
+        array = np.fromfile(os.path.join(path, f"{name}.bin"), dtype=column["dtype"])
+        columns[name] = array.reshape((-1, *column["shape"]))
+    rows = min(len(array) for array in columns.values())  # A run cut short mid-append is dropped
+    return {name: array[:rows] for name, array in columns.items()}, schema
+
+
+def summarise(columns, schema):
+    """Per distinct parameter combination: run count and the mean of every metric over its seeds.
+
+    Returns a list of (parameters, runs, means) sorted by parameters;
+    first_lab_tick is averaged over the runs that built a lab, NaN if none did.
+    """
+    parameters = [name for name, column in schema["columns"].items() if column.get("parameter")]
+    if not len(columns["run_id"]):
+        return []
+    if parameters:
+        keys = np.stack([columns[name].astype(np.float64) for name in parameters], axis=1)
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+    else:
+        groups, inverse = np.zeros((1, 0)), np.zeros(len(columns["run_id"]), dtype=np.int64)
+    runs = np.bincount(inverse, minlength=len(groups))
+    lab_built = columns["first_lab_tick"] >= 0
+    labbed = np.bincount(inverse, weights=lab_built, minlength=len(groups))
+    lab_ticks = np.bincount(inverse, weights=np.where(lab_built, columns["first_lab_tick"], 0), minlength=len(groups))
+    means = {}
+    for name, _ in METRIC_COLUMNS[2:]:
+        means[name] = np.bincount(inverse, weights=columns[name], minlength=len(groups)) / runs
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means["first_lab_tick"] = lab_ticks / labbed
+    curves = np.zeros((len(groups), columns["probe_count"].shape[1]))
+    np.add.at(curves, inverse, columns["probe_count"])
+    means["probe_count"] = curves / runs[:, None]
+
+    summary = []
+    for group, key in enumerate(groups):
+        summary.append(({name: value.item() for name, value in zip(parameters, key)}, int(runs[group]),
+                        {name: mean[group] for name, mean in means.items()}))
+    return summary
+
+
+# --------------------------
+# Sweep Runner
+# --------------------------
+def run_sweep(path, overrides_list, seeds, ticks, sample_every=SAMPLE_EVERY, base=DEFAULT_CONFIG, workers=None,
+              vectorised=False, on_result=None, galaxy_cache=GALAXY_CACHE_DIR):
+    """Runs every override dict against every seed in a process pool, streaming rows into `path`.
+
+    `on_result(row, done, total)` runs in this process as each run finishes.
+    Each distinct galaxy is generated into `galaxy_cache` (None: no cache)
+    here first, so workers only map it. Returns the number of runs written.
+    """
+    parameters = {}
+    for overrides in overrides_list:
+        apply_overrides(base, overrides)  # Fail on a bad parameter before starting any workers
+        for name, value in overrides.items():
+            if isinstance(value, float) or parameters.get(name) == "<f8":
+                parameters[name] = "<f8"
+            else:
+                parameters[name] = "<i8"
+    for overrides in overrides_list:
+        if set(overrides) != set(parameters):
+            raise ValueError("every config in a sweep must set the same parameters")
+
+    jobs = []
+    galaxies = set()
+    for overrides in overrides_list:
+        config = apply_overrides(base, overrides)
+        for seed in seeds:
+            jobs.append((len(jobs), base.to_dict(), overrides, seed, ticks, sample_every, vectorised, galaxy_cache))
+            galaxies.add((config.world_width, config.world_height, config.num_stars, seed))
+    if galaxy_cache is not None:
+        for world_width, world_height, num_stars, seed in sorted(galaxies):
+            load_galaxy(world_width, world_height, num_stars, seed, galaxy_cache)
+
+    writer = ResultsWriter(path, parameters, ticks, sample_every, base)
+    done = 0
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+            for row in pool.imap_unordered(run_one, jobs):
+                writer.append(row)
+                done += 1
+                if on_result is not None:
+                    on_result(row, done, len(jobs))
+    finally:
+        writer.close()
+    return done
+
+
+def _parse_assignments(values, parse):
+    parsed = {}
+    for value in values:
+        name, separator, spec = value.partition("=")
+        if not separator:
+            raise argparse.ArgumentTypeError(f"expected name=values, got {value!r}")
+        parsed[name] = parse(spec)
+    return parsed
+
+
+def _print_summary(path):
+    columns, schema = load_results(path)
+    summary = summarise(columns, schema)
+    print(f"{len(columns['run_id'])} runs of {schema['ticks']} ticks in {path}")
+    for parameters, runs, means in summary:
+        label = ", ".join(f"{name}={value:g}" for name, value in parameters.items()) or "base config"
+        delivered = sum(means[f"delivered_{resource}"] for resource in ("minerals", "gases", "energy", "research"))
+        print(f"{label}: {runs} runs, probes {means['probes']:.1f}, labs {means['research_labs']:.1f}, "
+              f"first lab at {means['first_lab_tick']:.0f}, delivered {delivered:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep simulation parameters over a pool of worker processes.")
+    parser.add_argument("results", help="Directory for the columnar results")
+    parser.add_argument("--summary", action="store_true", help="Summarise existing results instead of running")
+    parser.add_argument("--ticks", type=int, default=None, help="Ticks per run")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1], help="Seeds every config is run with")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="Sweep a parameter over these values; several --grid flags make a full grid")
+    parser.add_argument("--range", action="append", default=[], metavar="NAME=LOW:HIGH",
+                        help="Sample a parameter uniformly from this range with --sample")
+    parser.add_argument("--sample", type=int, default=None, help="Number of random configs drawn from the --range flags")
+    parser.add_argument("--sample-seed", type=int, default=0, help="Seed for drawing the sampled configs")
+    parser.add_argument("--base", default=None, help="JSON file of SimConfig overrides every run starts from")
+    parser.add_argument("--sample-every", type=int, default=SAMPLE_EVERY, help="Ticks between probe count samples")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--vectorised", action="store_true", help="Move probes with the NumPy engine")
+    parser.add_argument("--no-galaxy-cache", action="store_true",
+                        help=f"Always generate galaxies instead of loading them from {GALAXY_CACHE_DIR}")
+    args = parser.parse_args()
+
+    if args.summary:
+        _print_summary(args.results)
+        return
+    if args.ticks is None:
+        parser.error("--ticks is required to run a sweep")
+    if args.grid and args.range:
+        parser.error("use either --grid or --range, not both")
+    if args.range and args.sample is None:
+        parser.error("--range needs --sample")
+
+    try:
+        axes = _parse_assignments(args.grid, lambda spec: [_number(value) for value in spec.split(",")])
+        ranges = _parse_assignments(args.range, lambda spec: tuple(_number(value) for value in spec.split(":")))
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
+    if any(len(bounds) != 2 for bounds in ranges.values()):
+        parser.error("--range takes NAME=LOW:HIGH")
+
+    base = DEFAULT_CONFIG
+    if args.base:
+        with open(args.base) as file:
+            base = SimConfig(**json.load(file))
+    if ranges:
+        overrides_list = sample_overrides(ranges, args.sample, random.Random(args.sample_seed))
+    else:
+        overrides_list = grid_overrides(axes)  # No axes gives a single run of the base config per seed
+
+    start = time.perf_counter()
+
+    def on_result(row, done, total):
+        print(f"[{done}/{total}] run {row['run_id']} seed {row['seed']}: probes {row['probes']}, "
+              f"labs {row['research_labs']}, first lab at {row['first_lab_tick']} ({row['elapsed']:.1f}s)")
+
+    runs = run_sweep(args.results, overrides_list, args.seeds, args.ticks, args.sample_every, base, args.workers,
+                     args.vectorised, on_result, None if args.no_galaxy_cache else GALAXY_CACHE_DIR)
+    print(f"Ran {runs} runs in {time.perf_counter() - start:.1f}s")
+    _print_summary(args.results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""The NumPy engine must leave a run exactly where the scalar loop does."""
+import pytest
+
+pytest.importorskip("numpy")
+
+from benchmark import build_scenario
+from checkpoint import snapshot, snapshot_digest
+from events import EVENTS, OFF
+
+
+def state_digest(simulation):
+    arrays, meta = snapshot(simulation)
+    del meta["vectorised"]  # The only field the two runs are meant to differ in
+    return snapshot_digest(arrays, meta)
+
+
+def test_vectorised_matches_scalar(monkeypatch):
+    monkeypatch.setattr(EVENTS, "level", OFF)
+    scalar = build_scenario(400, 1500, seed=3)
+    vectorised = build_scenario(400, 1500, seed=3, vectorised=True)
+    for tick in range(300):
+        scalar.step()
+        vectorised.step()
+        if tick % 100 == 99:
+            assert state_digest(vectorised) == state_digest(scalar), f"engines diverged by tick {tick + 1}"
@@ -0,0 +1,363 @@
+"""Event-driven "time warp" runner that skips ticks in which nothing interesting happens.
+
+Most ticks only move a probe another `speed` pixels along a straight line,
+mine one more unit from the same star, count a colony timer down or add
+lab research. Each of those is linear, so instead of updating every probe
+every tick, TimeWarp works out the next tick at which each probe or the
+colony can take a decision and sleeps it until then:
+
+* a travelling probe wakes on the tick it would arrive,
+* probes mining a star, once every probe headed there has arrived, wake
+  one tick before any of their cargo slots fills or the star runs out of
+  a resource they are mining,
+* a probe that found no star at all stays parked until the star index
+  gains a star (a chunk loading); nothing else can hand it one,
+* the colony wakes when its research can buy the speed upgrade, when a
+  construction timer runs out with resources above threshold, or right
+  after a delivery.
+
+Sleeping objects are brought up to date lazily ("settled") in closed form,
+and a real probe update / `Colony.update()` runs only on wake ticks, in
+the same order as `Simulation.step`. Gossip runs every `gossip_interval`
+ticks instead of every tick; that is the one deliberate approximation, and
+gossip_interval=1 keeps it as close to stepping as the closed-form
+positions allow.
+
+Call `settle()` before reading probe positions, cargo or star amounts
+mid-run; `run()` settles everything before it returns.
+"""
+import heapq
+import math
+
+from events import DEBUG, EVENTS, Mined
+from simulation import Star, resolve_arrivals
+from star_index import RESOURCE_TYPES
+
+GOSSIP_INTERVAL = 50  # Ticks between communication rounds while warping
+NEVER = math.inf
+
+AWAKE = 0  # Updated for real next tick
+TRAVELLING = 1
+MINING = 2
+PARKED = 3
+
+
+class _Plan:
+    """What a sleeping probe does every tick until it wakes."""
+
+    __slots__ = ("kind", "settled", "start", "start_x", "start_y", "step_x", "step_y", "star", "resource")
+
+    def __init__(self, kind, tick):
+        self.kind = kind
+        self.settled = tick  # Last tick whose effects have been applied to the probe
+        self.start = tick
+        self.star = None  # Target star, if the target is one
+        self.resource = None
+
+
+# --------------------------
+# Time Warp Class
+# --------------------------
+class TimeWarp:
+    """Advances a Simulation from wake-up to wake-up instead of tick by tick."""
+
+    def __init__(self, simulation, gossip_interval=GOSSIP_INTERVAL):
+        self.simulation = simulation
+        self.gossip_interval = gossip_interval
+        self.tick = simulation.tick
+        self.plans = {}  # probe -> _Plan
+        self.wake = {}  # probe -> tick of its next real update
+        self.order = {}  # probe -> position in the probe list, so same-tick wakes keep Simulation's order
+        self.queue = []  # (wake tick, order, probe); entries whose tick no longer matches self.wake are stale
+        self.targeting = {}  # star -> probes whose target it is
+        self.miners = {}  # star -> probes sleeping while they mine it
+        self.arrived = set()  # Stars with a probe at them after this tick's updates
+        self.parked = set()  # Probes that found no star, asleep until one is added
+        self.stars_added = False  # Whether the star index gained a star since parked probes were last woken
+        simulation.colony.star_index.added_listeners.append(self._star_added)
+        self.colony_settled = self.tick
+        self.colony_wake = self.tick + 1
+        simulation.sync_probes()
+        simulation.engine = None  # Warping moves the Probe objects themselves; the next plain tick rebuilds it
+        for probe in simulation.probes:
+            self._add(probe)
+
+    def _add(self, probe):
+        self.order[probe] = len(self.order)
+        plan = self.plans[probe] = _Plan(AWAKE, self.tick)
+        self._wake_at(probe, self.tick + 1)
+        if isinstance(probe.target, Star):
+            plan.star = probe.target
+            self.targeting.setdefault(probe.target, set()).add(probe)
+
+    def _wake_at(self, probe, tick):
+        self.wake[probe] = tick
+        if tick != NEVER:
+            heapq.heappush(self.queue, (tick, self.order[probe], probe))
+
+    # --- Settling ---
+    def _settle_probe(self, probe, upto):
+        """Applies the sleeping probe's ticks up to and including `upto`."""
+        plan = self.plans[probe]
+        elapsed = upto - plan.settled
+        if elapsed <= 0:
+            return
+        if probe.replication_cooldown > 0:
+            probe.replication_cooldown = max(0, probe.replication_cooldown - elapsed)
+        if plan.kind == TRAVELLING:
+            moves = upto - plan.start
+            probe.x = plan.start_x + plan.step_x * moves
+            probe.y = plan.start_y + plan.step_y * moves
+        elif plan.kind == MINING:
+            amount = elapsed * probe.mining_rate  # The window is sized so every tick mines the full rate
+            mined = plan.star.mine_resource(plan.resource, amount)
+            probe.cargo[plan.resource] += mined
+            if EVENTS.level <= DEBUG:
+                EVENTS.emit(Mined(RESOURCE_TYPES[plan.resource], mined, dict(zip(RESOURCE_TYPES, probe.cargo))))
+        plan.settled = upto
+
+    def _settle_colony(self, upto):
+        elapsed = upto - self.colony_settled
+        if elapsed <= 0:
+            return
+        colony = self.simulation.colony
+        colony.probe_construction_timer = max(0, colony.probe_construction_timer - elapsed)
+        colony.lab_construction_timer = max(0, colony.lab_construction_timer - elapsed)
+        colony.research += colony.research_labs * colony.config.research_lab_research_rate * elapsed
+        self.colony_settled = upto
+
+    def settle(self, upto=None):
+        """Brings every probe and the colony up to date with tick `upto` (default: the current tick)."""
+        if upto is None:
+            upto = self.tick
+        for probe in self.simulation.probes:
+            self._settle_probe(probe, upto)
+        self._settle_colony(upto)
+
+    # --- Scheduling ---
+    def _schedule(self, probe, tick, had_target):
+        """Plans the probe's ticks after a real update at `tick` and queues its next wake-up."""
+        old_plan = self.plans[probe]
+        if old_plan.star is not None:
+            self.targeting[old_plan.star].discard(probe)
+            if old_plan.kind == MINING:
+                self.miners[old_plan.star].discard(probe)
+
+        target = probe.target
+        if target is None:
+            if had_target:
+                self.plans[probe] = _Plan(AWAKE, tick)  # Just delivered or gave up a star; looks again next tick
+                self._wake_at(probe, tick + 1)
+            else:
+                # choose_target found nothing. Cargo and visited stars only ever shrink the
+                # choice from here, so only a star added to the index can change that.
+                self.plans[probe] = _Plan(PARKED, tick)
+                self.parked.add(probe)
+                self._wake_at(probe, NEVER)
+            return
+
+        is_star = isinstance(target, Star)
+        if is_star:
+            self.targeting.setdefault(target, set()).add(probe)
+        dx = target.x - probe.x
+        dy = target.y - probe.y
+        distance = math.hypot(dx, dy)
+        speed = probe.speed
+
+        if distance > speed:
+            plan = _Plan(TRAVELLING, tick)
+            plan.star = target if is_star else None
+            plan.start_x, plan.start_y = probe.x, probe.y
+            plan.step_x = dx / distance * speed
+            plan.step_y = dy / distance * speed
+            self.plans[probe] = plan
+            arrival = tick + max(1, math.ceil(distance / speed - 1))  # Arrives on the tick it ends within `speed`
+            self._wake_at(probe, arrival)
+            if is_star:
+                for miner in self.miners.get(target, ()):
+                    if self.wake[miner] > arrival:  # Must stop mining in bulk before someone else shares the star
+                        self._wake_at(miner, arrival)
+            return
+
+        plan = _Plan(AWAKE, tick)  # At its target: mines, delivers or leaves next tick
+        self.plans[probe] = plan
+        self._wake_at(probe, tick + 1)
+        if is_star:
+            plan.star = target
+            self.arrived.add(target)  # May join the star's miners in bulk once the tick is done
+
+    def _star_added(self, star):
+        self.stars_added = True
+
+    def _wake_parked(self, tick):
+        """Wakes every parked probe next tick; a star was added somewhere any of them might reach."""
+        for probe in self.parked:
+            self.plans[probe].kind = AWAKE
+            self._wake_at(probe, tick + 1)
+        self.parked.clear()
+        self.stars_added = False
+
+    def _sleep_miners(self, star, tick):
+        """Puts every probe at `star` to sleep while all of them can keep mining at full rate.
+
+        Uses the same resource choice as `resolve_arrivals`. It only applies when
+        every probe headed for the star is already there and due next tick;
+        a probe still on its way wakes the group when it arrives.
+        """
+        probes = self.targeting.get(star)
+        if not probes or star.total_resources() <= 0:
+            return
+        choices = []
+        draw = {}  # resource -> amount taken from the star per tick
+        window = NEVER
+        for probe in probes:
+            if self.wake[probe] != tick + 1 or math.hypot(star.x - probe.x, star.y - probe.y) > probe.speed:
+                return
+            resource = probe.resource_to_mine(star)
+            if resource is None:
+                return
+            window = min(window, (probe.max_cargo[resource] - probe.cargo[resource]) // probe.mining_rate)
+            draw[resource] = draw.get(resource, 0) + probe.mining_rate
+            choices.append((probe, resource))
+        for resource, amount in draw.items():
+            window = min(window, star.resources[resource] // amount)
+        window -= 1  # Wake for the last, partial or emptying tick
+        if window <= 0:
+            return
+
+        miners = self.miners.setdefault(star, set())
+        for probe, resource in choices:
+            plan = self.plans[probe]
+            plan.kind = MINING
+            plan.resource = resource
+            miners.add(probe)
+            self._wake_at(probe, tick + 1 + window)
+
+    def _next_colony_wake(self, tick):
+        """First tick after `tick` on which Colony.update can do more than count down and accrue research."""
+        colony = self.simulation.colony
+        config = colony.config
+        wakes = [NEVER]
+        lab_rate = colony.research_labs * config.research_lab_research_rate
+        if not colony.probe_speed_researched:
+            research_cost = config.probe_speed_upgrade_research_cost
+            if colony.research >= research_cost:
+                wakes.append(tick + 1)
+            elif lab_rate > 0:
+                wakes.append(tick + 1 + math.ceil((research_cost - colony.research) / lab_rate))
+        threshold = config.probe_construction_threshold
+        if len(self.simulation.probes) < config.max_probes and colony.minerals > threshold and colony.gases > threshold:
+            wakes.append(tick + 1 + colony.probe_construction_timer)
+        lab_cost = config.research_lab_build_cost
+        if (colony.minerals > lab_cost["minerals"] + config.research_lab_build_threshold and
+                colony.gases > lab_cost["gases"] + config.research_lab_build_threshold):
+            wakes.append(tick + 1 + colony.lab_construction_timer)
+        return min(wakes)
+
+    def _next_probe_wake(self):
+        queue = self.queue
+        while queue and self.wake[queue[0][2]] != queue[0][0]:
+            heapq.heappop(queue)  # Stale entry from a rescheduled probe
+        return queue[0][0] if queue else NEVER
+
+    # --- Running ---
+    def _process(self, tick):
+        """Runs the real updates due on `tick`, in the order Simulation.step would."""
+        simulation = self.simulation
+        colony = simulation.colony
+        EVENTS.tick = tick - 1  # Events raised during a step carry the tick it started from
+        self._settle_colony(tick - 1)
+        resources = (colony.minerals, colony.gases, colony.energy, colony.research)
+
+        queue = self.queue
+        woken = []
+        handled = set()
+        arrived = []
+        idle = []
+        while queue and queue[0][0] == tick:
+            _, _, probe = heapq.heappop(queue)
+            if self.wake[probe] != tick or probe in handled:  # Rescheduled, or a duplicate entry for this tick
+                continue
+            handled.add(probe)
+            self._settle_probe(probe, tick - 1)
+            if probe.replication_cooldown > 0:
+                probe.replication_cooldown -= 1
+            target = probe.target
+            if target is None:  # Left for the assignment stage, as in Simulation.update_probes
+                idle.append(probe)
+                continue
+            if isinstance(target, Star):
+                for miner in self.miners.get(target, ()):
+                    self._settle_probe(miner, tick - 1)  # Whatever they mined so far comes off the star first
+            if probe.move():
+                arrived.append(probe)
+            woken.append(probe)
+        if arrived:
+            resolve_arrivals(arrived)
+        for probe in woken:
+            self.plans[probe].settled = tick
+            self._schedule(probe, tick, True)
+        if idle:
+            simulation.assign_targets(idle)
+            for probe in idle:
+                self.plans[probe].settled = tick
+                self._schedule(probe, tick, False)
+
+        if self.colony_wake == tick or resources != (colony.minerals, colony.gases, colony.energy, colony.research):
+            probe_count = len(simulation.probes)
+            colony.update(simulation.probes)
+            self.colony_settled = tick
+            for probe in simulation.probes[probe_count:]:
+                self._add(probe)
+                self.plans[probe].settled = tick
+                self._schedule(probe, tick, True)  # Built with a target already assigned
+            self.colony_wake = self._next_colony_wake(tick)
+
+        for star in self.arrived:
+            self._sleep_miners(star, tick)
+        self.arrived.clear()
+
+        if self.gossip_interval and tick % self.gossip_interval == 0:
+            for probe in simulation.probes:
+                self._settle_probe(probe, tick)  # Gossip needs everyone's current position
+            simulation.rebuild_grid()
+            simulation.communicate()
+
+        if simulation.galaxy is not None:
+            simulation.galaxy.load_requested()
+            simulation.galaxy.evict()
+        self.tick = simulation.tick = tick
+        EVENTS.tick = tick
+
+    def run(self, ticks=None, stop_condition=None, on_tick=None, sync_interval=None):
+        """Warps forward `ticks` ticks, or until `stop_condition(simulation)` holds after a processed tick.
+
+        With `sync_interval`, every multiple of it is processed and fully
+        settled before `on_tick(simulation)` runs, e.g. to write a checkpoint.
+        Returns the number of ticks advanced.
+        """
+        if ticks is None and stop_condition is None:
+            raise ValueError("TimeWarp.run needs a tick count or a stop condition")
+        start = self.tick
+        end = NEVER if ticks is None else start + ticks
+        while self.tick < end:
+            if stop_condition is not None and stop_condition(self.simulation):
+                break
+            if self.stars_added:  # During the last tick, or by a caller between runs
+                self._wake_parked(self.tick)
+            events = min(self._next_probe_wake(), self.colony_wake)
+            if events == NEVER and end == NEVER:
+                break  # Everything is parked; no condition can change any more
+            candidates = [events, end]
+            if self.gossip_interval and events != NEVER:
+                candidates.append((self.tick // self.gossip_interval + 1) * self.gossip_interval)
+            if sync_interval:
+                candidates.append((self.tick // sync_interval + 1) * sync_interval)
+            tick = min(candidates)
+            self._process(tick)
+            if sync_interval and tick % sync_interval == 0:
+                self.settle()
+                if on_tick is not None:
+                    on_tick(self.simulation)
+        self.settle()
+        return self.tick - start
@@ -0,0 +1,213 @@
+"""Optional NumPy engine that moves every probe in one batched operation per tick."""
+import numpy as np
+
+from events import DEBUG, EVENTS
+from simulation import Star, resolve_arrivals
+
+
+# --------------------------
+# Vector Probe Engine Class
+# --------------------------
+class VectorProbeEngine:
+    """Structure-of-arrays store of probe kinematics.
+
+    Slot i holds probes[i]'s position, speed, target coordinates and cooldown.
+    `advance()` moves every probe with a target at once, using the same
+    arithmetic as `Probe.move`, and returns the slots that need per-probe
+    logic this tick: probes that arrived and probes without a target.
+    The arrays are the real positions and cooldowns: a Probe object's copy
+    is only brought up to date when per-probe logic runs on it, or by
+    `write_back()` for a reader outside the tick (snapshot, checkpoint).
+    Everything else (cargo, visited stars, state) stays on the Probe objects.
+    """
+
+    def __init__(self, probes=(), capacity=1024):
+        self.probes = []
+        self.targets = []  # The target each slot's target_x/target_y were loaded from
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.target_x = np.zeros(capacity)
+        self.target_y = np.zeros(capacity)
+        self.has_target = np.zeros(capacity, dtype=bool)
+        self.at_star = np.zeros(capacity, dtype=bool)  # Whether the target is a star
+        self.cooldown = np.zeros(capacity, dtype=np.int64)
+        for probe in probes:
+            self.add(probe)
+
+    def __len__(self):
+        return len(self.probes)
+
+    def _grow(self, capacity):
+        for name in ("x", "y", "speed", "target_x", "target_y", "has_target", "at_star", "cooldown"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, probe):
+        """Appends a probe to the arrays; slots follow the order of the probes list."""
+        slot = len(self.probes)
+        if slot == len(self.x):
+            self._grow(2 * len(self.x))
+        self.probes.append(probe)
+        self.targets.append(None)
+        self.x[slot] = probe.x
+        self.y[slot] = probe.y
+        self.speed[slot] = probe.speed
+        self.cooldown[slot] = probe.replication_cooldown
+        self.load_target(slot)
+
+    def sync(self, probes):
+        """Adopts probes appended to the simulation's list since the last tick."""
+        for probe in probes[len(self.probes):]:
+            self.add(probe)
+
+    def load_target(self, slot):
+        """Refreshes a slot's target after per-probe logic may have changed it; positions only move here."""
+        target = self.probes[slot].target
+        if target is self.targets[slot]:
+            return
+        self.targets[slot] = target
+        self.at_star[slot] = isinstance(target, Star)
+        if target:
+            self.target_x[slot] = target.x
+            self.target_y[slot] = target.y
+            self.has_target[slot] = True
+        else:
+            self.has_target[slot] = False
+
+    def advance(self):
+        """Moves all probes one tick. Returns sorted slots that arrived or have no target."""
+        n = len(self.probes)
+        x, y, speed = self.x[:n], self.y[:n], self.speed[:n]
+        target_x, target_y = self.target_x[:n], self.target_y[:n]
+        has_target = self.has_target[:n]
+        cooldown = self.cooldown[:n]
+
+        np.subtract(cooldown, 1, out=cooldown, where=cooldown > 0)
+
+        dx = target_x - x
+        dy = target_y - y
+        distance = np.sqrt(dx * dx + dy * dy)
+        moving = has_target & (distance > speed)  # Still move towards target
+        step = np.where(moving, speed, 0.0)
+        safe_distance = np.where(moving, distance, 1.0)
+        # Same operation order as Probe.move so both engines agree bit for bit
+        x += dx / safe_distance * step
+        y += dy / safe_distance * step
+        dx = target_x - x
+        dy = target_y - y
+        distance = np.where(moving, np.sqrt(dx * dx + dy * dy), distance)
+
+        arrived = has_target & (distance <= speed)
+        return np.flatnonzero(arrived | ~has_target)
+
+    def write_back(self, slots=None):
+        """Copies array positions and cooldowns onto the Probe objects in `slots` (default: all of them)."""
+        if slots is None:
+            slots = np.arange(len(self.probes))
+        probes = self.probes
+        for slot, x, y, cooldown in zip(slots.tolist(), self.x[slots].tolist(), self.y[slots].tolist(),
+                                        self.cooldown[slots].tolist()):
+            probe = probes[slot]
+            probe.x = x
+            probe.y = y
+            probe.replication_cooldown = cooldown
+
+    def positions(self):
+        """Array positions of every slot as lists, in probe list order."""
+        n = len(self.probes)
+        return self.x[:n].tolist(), self.y[:n].tolist()
+
+    def mine_steady(self, slots):
+        """Mines for probes at stars with plenty left; returns the slots that need `resolve_arrivals`.
+
+        Slots are grouped by star. When every probe at a star has something
+        to mine there and together they take less of each resource than the
+        star holds, each gets exactly its full amount, as in
+        `resolve_arrivals`, and they all stay; settling them here skips the
+        general stage. A star about to run out of a resource, or with a
+        probe that is done with it, sends its whole group through that stage.
+        """
+        probes = self.probes
+        targets = self.targets
+        groups = {}  # star -> its slots, in slot order
+        for slot in slots:
+            star = targets[slot]
+            group = groups.get(star)
+            if group is None:
+                groups[star] = [slot]
+            else:
+                group.append(slot)
+        rest = []
+        for star, group in groups.items():
+            left = star.resources
+            if len(group) == 1:  # The usual case: a star to itself
+                probe = probes[group[0]]
+                resource = probe.resource_to_mine(star)
+                if resource is not None:
+                    amount = min(probe.mining_rate, probe.max_cargo[resource] - probe.cargo[resource], left[resource])
+                    if 0 < amount < left[resource]:
+                        star.mine_resource(resource, amount)
+                        probe.cargo[resource] += amount
+                        continue
+                rest.extend(group)
+                continue
+            asked = []
+            draw = [0, 0, 0, 0]
+            for slot in group:
+                probe = probes[slot]
+                resource = probe.resource_to_mine(star)
+                if resource is None:
+                    break
+                amount = min(probe.mining_rate, probe.max_cargo[resource] - probe.cargo[resource], left[resource])
+                if amount <= 0:
+                    break
+                asked.append((probe, resource, amount))
+                draw[resource] += amount
+            else:
+                if all(amount < available for amount, available in zip(draw, left) if amount):
+                    for resource, amount in enumerate(draw):
+                        if amount:
+                            star.mine_resource(resource, amount)
+                    for probe, resource, amount in asked:
+                        probe.cargo[resource] += amount
+                    continue
+            rest.extend(group)
+        return rest
+
+    def step(self, assign=None):
+        """Runs one probe tick: batched movement, then per-probe logic for the returned slots only.
+
+        Probes mining stars with plenty left are settled by `mine_steady`;
+        the other arrivals are settled together by `resolve_arrivals`, then
+        probes without a target are handed to `assign` together, the same
+        order the scalar loop uses; without it each picks its own star.
+        Settling the steady miners first changes nothing the others read:
+        they are at other stars, and every search runs after both.
+        """
+        pending = self.advance()
+        has_target = self.has_target[pending]
+        arrived = pending[has_target]
+        idle = pending[~has_target]
+        if arrived.size and EVENTS.level > DEBUG:  # Mined events would come out in a different order
+            at_star = self.at_star[arrived]
+            rest = self.mine_steady(arrived[at_star].tolist())
+            arrived = np.union1d(arrived[~at_star], np.array(rest, dtype=np.intp))
+        self.write_back(arrived)  # Only these probes' logic reads a position this tick
+        self.write_back(idle)
+        arrived = arrived.tolist()
+        idle = idle.tolist()
+        if arrived:
+            resolve_arrivals([self.probes[slot] for slot in arrived])
+            for slot in arrived:
+                self.load_target(slot)
+        if idle:
+            if assign is None:
+                for slot in idle:
+                    self.probes[slot].choose_target()
+            else:
+                assign([self.probes[slot] for slot in idle])
+            for slot in idle:
+                self.load_target(slot)